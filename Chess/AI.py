@@ -1,123 +1,500 @@
 """
 Handling the AI moves.
 """
+import os
 import random
-import numpy
-
-piece_score = {"K": 20000, "Q": 900, "R": 500, "B": 330, "N": 320, "p": 100}
-
-PAWN_TABLE = numpy.array([
-    [0, 0, 0, 0, 0, 0, 0, 0],
-    [5, 10, 10, -20, -20, 10, 10, 5],
-    [5, -5, -10, 0, 0, -10, -5, 5],
-    [0, 0, 0, 20, 20, 0, 0, 0],
-    [5, 5, 10, 25, 25, 10, 5, 5],
-    [10, 10, 20, 30, 30, 20, 10, 10],
-    [50, 50, 50, 50, 50, 50, 50, 50],
-    [0, 0, 0, 0, 0, 0, 0, 0]
-])
-
-KNIGHT_TABLE = numpy.array([
-    [-50, -40, -30, -30, -30, -30, -40, -50],
-    [-40, -20, 0, 5, 5, 0, -20, -40],
-    [-30, 5, 10, 15, 15, 10, 5, -30],
-    [-30, 0, 15, 20, 20, 15, 0, -30],
-    [-30, 5, 15, 20, 20, 15, 0, -30],
-    [-30, 0, 10, 15, 15, 10, 0, -30],
-    [-40, -20, 0, 0, 0, 0, -20, -40],
-    [-50, -40, -30, -30, -30, -30, -40, -50]
-])
-
-BISHOP_TABLE = numpy.array([
-    [-20, -10, -10, -10, -10, -10, -10, -20],
-    [-10, 5, 0, 0, 0, 0, 5, -10],
-    [-10, 10, 10, 10, 10, 10, 10, -10],
-    [-10, 0, 10, 10, 10, 10, 0, -10],
-    [-10, 5, 5, 10, 10, 5, 5, -10],
-    [-10, 0, 5, 10, 10, 5, 0, -10],
-    [-10, 0, 0, 0, 0, 0, 0, -10],
-    [-20, -10, -10, -10, -10, -10, -10, -20]
-])
-
-ROOK_TABLE = numpy.array([
-    [0, 0, 0, 5, 5, 0, 0, 0],
-    [-5, 0, 0, 0, 0, 0, 0, -5],
-    [-5, 0, 0, 0, 0, 0, 0, -5],
-    [-5, 0, 0, 0, 0, 0, 0, -5],
-    [-5, 0, 0, 0, 0, 0, 0, -5],
-    [-5, 0, 0, 0, 0, 0, 0, -5],
-    [5, 10, 10, 10, 10, 10, 10, 5],
-    [0, 0, 0, 0, 0, 0, 0, 0]
-])
-
-QUEEN_TABLE = numpy.array([
-    [-20, -10, -10, -5, -5, -10, -10, -20],
-    [-10, 0, 5, 0, 0, 0, 0, -10],
-    [-10, 5, 5, 5, 5, 5, 0, -10],
-    [0, 0, 5, 5, 5, 5, 0, -5],
-    [-5, 0, 5, 5, 5, 5, 0, -5],
-    [-10, 0, 5, 5, 5, 5, 0, -10],
-    [-10, 0, 0, 0, 0, 0, 0, -10],
-    [-20, -10, -10, -5, -5, -10, -10, -20]
-])
-
-piece_position_scores = {"bN": KNIGHT_TABLE,
-                         "wN": KNIGHT_TABLE[::-1],
-                         "bB": BISHOP_TABLE,
-                         "wB": BISHOP_TABLE[::-1],
-                         "bQ": QUEEN_TABLE,
-                         "wQ": QUEEN_TABLE[::-1],
-                         "bR": ROOK_TABLE,
-                         "wR": ROOK_TABLE[::-1],
-                         "bp": PAWN_TABLE,
-                         "wp": PAWN_TABLE[::-1]}
-
-CHECKMATE = 1000
+import sys
+import time
+
+from OpeningBook import OpeningBook
+from PieceTables import piece_position_scores, piece_score
+from SearchStatistics import PhaseProfiler, SearchStatistics
+from TranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, NO_MOVE
+
+CHECKMATE = 100000  # far above any material total, a mate n plies from the root scores CHECKMATE - n
 STALEMATE = 0
-DEPTH = 3
+DRAW = 0  # repetition, fifty-move rule and insufficient material
+INFINITY = float('inf')
+DEPTH = 3  # depth searched when no time budget is given
+MAX_DEPTH = 64
+MATE_BOUND = CHECKMATE - MAX_DEPTH  # scores beyond this are mates, which the search never reaches deeper than MAX_DEPTH
+MOVES_TO_GO = 30  # moves the remaining clock is assumed to cover
+TIME_SAFETY_MARGIN = 0.05  # seconds kept back for process and queue overhead
+TIME_CHECK_INTERVAL = 511  # look at the clock every 512 nodes
+DELTA_MARGIN = 200  # captures that cannot lift the score this close to alpha are skipped in quiescence
+TT_SIZE_MB = 16
+EVAL_DEBUG = False  # assert the incremental score against a full board scan at every leaf
+
+# search enhancements, each can be switched off on its own to measure what it is worth
+USE_PVS = True  # later moves are searched with a zero window first and only re-searched if they beat alpha
+USE_NULL_MOVE = True  # pass the turn at reduced depth, a score still at or above beta cuts the node off
+USE_LMR = True  # late quiet moves are searched one ply shallower first
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_MIN_DEPTH = 3
+LMR_MIN_DEPTH = 3
+LMR_FULL_DEPTH_MOVES = 3  # moves searched at full depth before reductions start
+LMR_REDUCTION = 1
+
+USE_BOOK = True  # play a book move without searching when the position is in the opening book
+SHUFFLE_ROOT_MOVES = True  # vary the choice between equal moves from game to game, off for reproducible searches
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'book.bin')
+
+# move ordering: capture values for MVV-LVA and the quiet move heuristics
+ORDER_VALUES = {"p": 1, "N": 2, "B": 3, "R": 4, "Q": 5, "K": 6}
+KILLERS_PER_PLY = 2
+
+transposition_table = TranspositionTable(TT_SIZE_MB)
+killer_moves = [[NO_MOVE] * KILLERS_PER_PLY for _ in range(MAX_DEPTH + 1)]
+history_table = {}
+EMPTY_HISTORY = [0] * 64
+next_move = None
+count = 0
+quiescence_count = 0
+cutoffs = 0
+first_move_cutoffs = 0
+root_ply = 0  # length of the move log at the root
+stop_time = None
+stop_check = None
+node_limit = float('inf')
+opening_book = None
+book_opened = False  # BOOK_PATH is only looked at once
+
 
+class SearchTimeout(Exception):
+    pass
 
 
+def allocateTime(move_time=None, time_left=None, increment=0):
+    """
+    Seconds to spend on this move: a fixed move_time, or a share of the remaining clock plus most of the increment.
+    None means no time limit.
+    """
+    if move_time is not None:
+        return max(0.0, move_time - TIME_SAFETY_MARGIN)
+    if time_left is not None:
+        budget = time_left / MOVES_TO_GO + increment * 0.8
+        return max(0.0, min(budget, time_left - TIME_SAFETY_MARGIN))
+    return None
 
-def findBestMove(game_state, valid_moves, return_queue):
-    global next_move, count
-    next_move = None
+
+def findBestMove(game_state, valid_moves, return_queue=None, max_depth=None, move_time=None, time_left=None,
+                 increment=0, should_stop=None, depth_callback=None, statistics=None, profile=False, log=None,
+                 max_nodes=None):
+    """
+    Iterative deepening: search depth 1, 2, ... until max_depth or the time budget runs out, keeping the best move of
+    the last finished depth (or of the unfinished one once its first move, the previous best, has been searched).
+    Without a time budget the search runs to DEPTH like before. should_stop is an optional callable polled with the
+    clock, returning True aborts the search the same way running out of time does. depth_callback, if given, is called
+    with (depth, score, best move) after every completed depth, the score from the point of view of the side to move.
+    Returns (best move, SearchStatistics of the search), return_queue if given gets just the move. statistics, if
+    given, is the SearchStatistics to fill in, reset first and already up to date when depth_callback runs.
+    profile=True also measures the time spent in move generation and evaluation, at the cost of a slower search.
+    The search prints nothing; log, if given, is called with a line of text for the book move, every completed depth
+    and the final statistics. max_nodes stops the search at exactly that many nodes, quiescence nodes included; it is
+    tested on every node, unlike the clock and should_stop.
+    """
+    global next_move, count, quiescence_count, cutoffs, first_move_cutoffs, root_ply, stop_time, \
+        stop_check, node_limit
+    budget = allocateTime(move_time, time_left, increment)
+    if max_depth is None:
+        max_depth = DEPTH if budget is None else MAX_DEPTH
+    start_time = time.perf_counter()
+    stop_time = None  # depth 1 always completes so there is a move to return
+    stop_check = should_stop
+    node_limit = float('inf') if max_nodes is None else max_nodes
     count = 0
-    random.shuffle(valid_moves)
+    quiescence_count = 0
+    cutoffs = 0
+    first_move_cutoffs = 0
+    if statistics is None:
+        statistics = SearchStatistics()
+    else:
+        statistics.__init__()  # depth_nodes of an earlier search would skew the per depth counts
+    book_move = bookMove(game_state, valid_moves)
+    if book_move is not None:
+        if log is not None:
+            log('book move %s' % book_move.getChessNotation())
+        if return_queue is not None:
+            return_queue.put(book_move)
+        return book_move, statistics
+    if SHUFFLE_ROOT_MOVES:
+        random.shuffle(valid_moves)
+    transposition_table.newSearch()
+    clearMoveOrdering()
+    best_move = valid_moves[0] if valid_moves else None
+    root_length = root_ply = len(game_state.move_log)
+    turn_multiplier = 1 if game_state.WhiteToMove else -1
+    tt_hits, tt_probes = transposition_table.hits, transposition_table.hits + transposition_table.misses
+    profiler = PhaseProfiler(game_state, sys.modules[__name__]) if profile else None
+    if profiler is not None:
+        profiler.start()
+
+    try:
+        for depth in range(1, max_depth + 1):
+            next_move = None
+            try:
+                score = findMoveNegaMaxAlphaBeta(game_state, valid_moves, depth, 0, -INFINITY, INFINITY,
+                                                 turn_multiplier)
+            except SearchTimeout:
+                while len(game_state.move_log) > root_length:  # unwind the moves the aborted search left on the board
+                    if game_state.move_log[-1] is None:
+                        game_state.undoNullMove()
+                    else:
+                        game_state.undoMove()
+                if next_move is not None:
+                    best_move = next_move
+                break
+            best_move = next_move
+            statistics.depth_nodes.append(count - sum(statistics.depth_nodes))
+            updateStatistics(statistics, depth, start_time, tt_hits, tt_probes)
+            if log is not None:
+                log('depth %d score %s nodes %d time %.3f' % (depth, score, count, statistics.time))
+            if depth_callback is not None:
+                depth_callback(depth, score, best_move)
+            if budget is not None:
+                stop_time = start_time + budget
+                if time.perf_counter() >= stop_time:
+                    break
+    finally:
+        if profiler is not None:
+            statistics.phase_times = profiler.stop()
+    updateStatistics(statistics, len(statistics.depth_nodes), start_time, tt_hits, tt_probes)
+    if log is not None:
+        log(str(statistics))
+
+    if return_queue is not None:
+        return_queue.put(best_move)
+    return best_move, statistics
 
-    findMoveNegaMaxAlphaBeta(game_state, valid_moves, DEPTH, -CHECKMATE, CHECKMATE,
-                             1 if game_state.WhiteToMove else -1)
-    print(count)
 
-    return_queue.put(next_move)
+def updateStatistics(statistics, depth, start_time, tt_hits, tt_probes):
+    """
+    Copy the search counters into statistics, the table counters relative to their values when the search started.
+    """
+    statistics.depth = depth
+    statistics.nodes = count
+    statistics.quiescence_nodes = quiescence_count
+    statistics.time = time.perf_counter() - start_time
+    statistics.cutoffs = cutoffs
+    statistics.first_move_cutoffs = first_move_cutoffs
+    statistics.tt_hits = transposition_table.hits - tt_hits
+    statistics.tt_probes = transposition_table.hits + transposition_table.misses - tt_probes
+
+
+def openBook(path):
+    """
+    Use the opening book at path, or no book for None.
+    """
+    global opening_book, book_opened
+    if opening_book is not None:
+        opening_book.close()
+    opening_book = OpeningBook(path) if path is not None else None
+    book_opened = True
+
 
+def bookMove(game_state, valid_moves):
+    """
+    A move from the opening book, or None. The book at BOOK_PATH is opened on first use if it exists.
+    """
+    if not USE_BOOK:
+        return None
+    if not book_opened:
+        openBook(BOOK_PATH if os.path.exists(BOOK_PATH) else None)
+    if opening_book is None:
+        return None
+    return opening_book.pickMove(game_state, valid_moves)
 
-def findMoveNegaMaxAlphaBeta(game_state, valid_moves, depth, alpha, beta, turn_multiplier):
-    global next_move, count
+
+def findMoveNegaMaxAlphaBeta(game_state, valid_moves, depth, ply, alpha, beta, turn_multiplier):
+    """
+    ply is the distance from the root, which depth no longer tells once null move and LMR reduce it.
+    Only the root is given its moves, below it valid_moves is None and the moves are generated once the draw,
+    transposition table and null move checks could not end the node. At the horizon just the existence of a legal
+    move is tested, for mate and stalemate.
+    """
+    global next_move, count, cutoffs, first_move_cutoffs
+    if count >= node_limit:
+        raise SearchTimeout
     count += 1
-    if depth == 0:
-        return turn_multiplier * scoreBoard(game_state)
-    # move ordering - implement later //TODO
-    max_score = -CHECKMATE
-    for move in valid_moves:
+    if not count & TIME_CHECK_INTERVAL:
+        checkStop()
+    if ply != 0 and isSearchDraw(game_state):
+        return DRAW
+    if depth <= 0:  # reductions can step past the horizon
+        if not game_state.hasLegalMove():
+            return noMoveScore(game_state.in_check, ply)
+        return quiescenceSearch(game_state, alpha, beta, turn_multiplier)
+    alpha_original = alpha
+    key = game_state.zobristHash
+    entry = transposition_table.probe(key)
+    hash_move_id = NO_MOVE
+    if entry is not None:
+        entry_depth, entry_score, entry_bound, hash_move_id = entry
+        entry_score = scoreFromTable(entry_score, ply)
+        if entry_depth >= depth and ply != 0:  # the root always searches so it can pick next_move
+            if entry_bound == EXACT:
+                return entry_score
+            elif entry_bound == LOWER_BOUND:
+                alpha = max(alpha, entry_score)
+            else:
+                beta = min(beta, entry_score)
+            if alpha >= beta:
+                return entry_score
+    if USE_NULL_MOVE and depth >= NULL_MOVE_MIN_DEPTH and ply != 0 and \
+            game_state.move_log[-1] is not None and turn_multiplier * scoreBoard(game_state) >= beta and \
+            game_state.hasNonPawnMaterial() and not game_state.inCheck():
+        game_state.makeNullMove()
+        score = -findMoveNegaMaxAlphaBeta(game_state, None, depth - 1 - NULL_MOVE_REDUCTION, ply + 1, -beta,
+                                          -beta + 1, -turn_multiplier)
+        game_state.undoNullMove()
+        if score >= beta:
+            return beta if score >= MATE_BOUND else score  # passing proves no mate
+    if valid_moves is None:
+        valid_moves = game_state.getValidMoves()
+        in_check = game_state.in_check  # set by the getValidMoves call above
+    else:  # the root, its moves come from the caller and in_check has been overwritten by earlier iterations
+        in_check = game_state.inCheck()
+    if not valid_moves:
+        return noMoveScore(in_check, ply)
+    max_score = -INFINITY
+    best_move_id = NO_MOVE
+    for move_number, move in enumerate(orderedMoves(valid_moves, hash_move_id, ply)):
         game_state.makeMove(move)
-        next_moves = game_state.getValidMoves()
-        score = -findMoveNegaMaxAlphaBeta(game_state, next_moves, depth - 1, -beta, -alpha, -turn_multiplier)
+        if move_number == 0:
+            score = -findMoveNegaMaxAlphaBeta(game_state, None, depth - 1, ply + 1, -beta, -alpha, -turn_multiplier)
+        else:
+            score = alpha + 1  # no reduced search: go straight to the full depth searches
+            if USE_LMR and depth >= LMR_MIN_DEPTH and move_number >= LMR_FULL_DEPTH_MOVES and not in_check and \
+                    not isTactical(move) and not game_state.inCheck():
+                score = -findMoveNegaMaxAlphaBeta(game_state, None, depth - 1 - LMR_REDUCTION, ply + 1, -alpha - 1,
+                                                  -alpha, -turn_multiplier)
+            if score > alpha and USE_PVS:
+                score = -findMoveNegaMaxAlphaBeta(game_state, None, depth - 1, ply + 1, -alpha - 1, -alpha,
+                                                  -turn_multiplier)
+            if score > alpha and (score < beta or not USE_PVS):
+                score = -findMoveNegaMaxAlphaBeta(game_state, None, depth - 1, ply + 1, -beta, -alpha,
+                                                  -turn_multiplier)
         if score > max_score:
             max_score = score
-            if depth == DEPTH:
+            best_move_id = move.moveID
+            if ply == 0:
                 next_move = move
         game_state.undoMove()
         if max_score > alpha:
             alpha = max_score
         if alpha >= beta:
+            cutoffs += 1
+            if move_number == 0:
+                first_move_cutoffs += 1
+            if not isTactical(move):
+                storeQuietCutoff(move, depth, ply)
             break
+    if max_score <= alpha_original:
+        bound = UPPER_BOUND
+    elif max_score >= beta:
+        bound = LOWER_BOUND
+    else:
+        bound = EXACT
+    transposition_table.store(key, depth, scoreToTable(max_score, ply), bound, best_move_id)
     return max_score
 
 
+def noMoveScore(in_check, ply):
+    """
+    Score of a position without legal moves for the side to move: mated when in check, else stalemate.
+    A mate closer to the root scores further from zero, so the search prefers the fastest mate and the slowest loss.
+    """
+    return ply - CHECKMATE if in_check else STALEMATE
+
+
+def scoreToTable(score, ply):
+    """
+    Mate scores are stored counted from the position rather than the root, so an entry holds wherever it is reached.
+    """
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def scoreFromTable(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def principalVariation(game_state, best_move, max_length=MAX_DEPTH):
+    """
+    best_move followed by the hash moves stored for the positions it leads to, stopping at a missing entry or a
+    repeated position.
+    """
+    line = [best_move]
+    seen = {game_state.zobristHash}
+    game_state.makeMove(best_move)
+    while len(line) < max_length and game_state.zobristHash not in seen:
+        seen.add(game_state.zobristHash)
+        entry = transposition_table.probe(game_state.zobristHash)
+        if entry is None or entry[3] == NO_MOVE:
+            break
+        move = next((move for move in game_state.getValidMoves() if move.moveID == entry[3]), None)
+        if move is None:
+            break
+        line.append(move)
+        game_state.makeMove(move)
+    for _ in line:
+        game_state.undoMove()
+    return line
+
+
+def isSearchDraw(game_state):
+    """
+    Draws the search scores without looking further. A position that repeats one from inside the search tree counts
+    as a draw straight away, since the side that repeated it can do so again.
+    """
+    return game_state.halfmoveClock >= 100 or game_state.repetitionCount(root_ply) >= 1 or \
+        game_state.repetitionCount() >= 2 or game_state.isInsufficientMaterial()
+
+
+def checkStop():
+    """
+    Abort the search once the time budget is spent or the caller asks it to stop.
+    """
+    if (stop_time is not None and time.perf_counter() >= stop_time) or (stop_check is not None and stop_check()):
+        raise SearchTimeout
+
+
+def quiescenceSearch(game_state, alpha, beta, turn_multiplier):
+    """
+    Resolve captures at the horizon. The side to move may stand pat on the static score, and captures that could not
+    raise it to alpha even after winning the piece (plus DELTA_MARGIN) are not searched.
+    """
+    global count, quiescence_count
+    if count >= node_limit:
+        raise SearchTimeout
+    count += 1
+    quiescence_count += 1
+    if not count & TIME_CHECK_INTERVAL:
+        checkStop()
+    stand_pat = turn_multiplier * scoreBoard(game_state)
+    if stand_pat >= beta:
+        return stand_pat
+    if stand_pat > alpha:
+        alpha = stand_pat
+    max_score = stand_pat
+    captures = game_state.getCaptureMoves()
+    captures.sort(key=mvvLva, reverse=True)
+    for move in captures:
+        gain = piece_score[move.pieceCaptured[1]] if move.pieceCaptured != "--" else 0
+        if move.isPawnPromotion:
+            gain += piece_score["Q"] - piece_score["p"]
+        if stand_pat + gain + DELTA_MARGIN <= alpha:
+            continue
+        game_state.makeMove(move)
+        score = -quiescenceSearch(game_state, -beta, -alpha, -turn_multiplier)
+        game_state.undoMove()
+        if score > max_score:
+            max_score = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+    return max_score
+
+
+def newGame():
+    """
+    Forget everything learnt from earlier searches: transposition table, killers and history.
+    """
+    transposition_table.clear()
+    history_table.clear()
+    for killers in killer_moves:
+        killers[:] = [NO_MOVE] * KILLERS_PER_PLY
+
+
+def clearMoveOrdering():
+    """
+    Killers are relative to the root so they are dropped, history is halved so it stays useful across moves.
+    """
+    for killers in killer_moves:
+        killers[:] = [NO_MOVE] * KILLERS_PER_PLY
+    for piece_history in history_table.values():
+        piece_history[:] = [value // 2 for value in piece_history]
+
+
+def isTactical(move):
+    return move.is_capture or move.isEnPassantMove or move.isPawnPromotion
+
+
+def mvvLva(move):
+    """
+    Most valuable victim first, least valuable attacker breaks ties.
+    """
+    victim = ORDER_VALUES[move.pieceCaptured[1]] if move.pieceCaptured != "--" else 0
+    return 10 * victim - ORDER_VALUES[move.pieceMoved[1]] + (50 if move.isPawnPromotion else 0)
+
+
+def storeQuietCutoff(move, depth, ply):
+    """
+    Remember a quiet move that caused a beta cutoff as a killer for this ply and in the history table.
+    """
+    killers = killer_moves[ply]
+    if killers[0] != move.moveID:
+        killers[1:] = killers[:-1]
+        killers[0] = move.moveID
+    piece_history = history_table.get(move.pieceMoved)
+    if piece_history is None:
+        piece_history = history_table[move.pieceMoved] = [0] * 64
+    piece_history[move.endRow * 8 + move.endCol] += depth * depth
+
+
+def historyScore(move):
+    return history_table.get(move.pieceMoved, EMPTY_HISTORY)[move.endRow * 8 + move.endCol]
+
+
+def orderedMoves(valid_moves, hash_move_id, ply):
+    """
+    Staged move ordering: the hash move, then captures and promotions by MVV-LVA, then killer moves, then the other
+    quiet moves by history score. Later stages are only sorted if the search gets that far without a cutoff.
+    """
+    hash_move = None
+    captures = []
+    quiets = []
+    for move in valid_moves:
+        if move.moveID == hash_move_id:
+            hash_move = move
+        elif isTactical(move):
+            captures.append(move)
+        else:
+            quiets.append(move)
+    if hash_move is not None:
+        yield hash_move
+
+    captures.sort(key=mvvLva, reverse=True)
+    yield from captures
+
+    killers = killer_moves[ply]
+    remaining = []
+    killer_found = [None] * KILLERS_PER_PLY
+    for move in quiets:
+        if move.moveID in killers:
+            killer_found[killers.index(move.moveID)] = move
+        else:
+            remaining.append(move)
+    for move in killer_found:
+        if move is not None:
+            yield move
+
+    remaining.sort(key=historyScore, reverse=True)
+    yield from remaining
+
+
 def scoreBoard(game_state):
     """
     Score the board. A positive score is good for white, a negative score is good for black.
+    Material and square table totals are kept up to date by makeMove/undoMove, so this is O(1).
     """
     if game_state.checkMate:
         if game_state.WhiteToMove:
@@ -126,7 +503,25 @@ def scoreBoard(game_state):
             return CHECKMATE  # white wins
     elif game_state.staleMate:
         return STALEMATE
-    score = 0
+    score = game_state.material + game_state.whitePosition - game_state.blackPosition * .01
+    if EVAL_DEBUG:
+        full_score = scoreBoardFull(game_state)
+        assert score == full_score, 'incremental score %s != full score %s' % (score, full_score)
+    return score
+
+
+def scoreBoardFull(game_state):
+    """
+    scoreBoard recomputed from every square of the board, used to check the incremental score.
+    """
+    if game_state.checkMate:
+        if game_state.WhiteToMove:
+            return -CHECKMATE  # black wins
+        else:
+            return CHECKMATE  # white wins
+    elif game_state.staleMate:
+        return STALEMATE
+    material = white_position = black_position = 0
     for row in range(len(game_state.board)):
         for col in range(len(game_state.board[row])):
             piece = game_state.board[row][col]
@@ -135,11 +530,13 @@ def scoreBoard(game_state):
                 if piece[1] != "K":
                     piece_position_score = piece_position_scores[piece][row][col]
                 if piece[0] == "w":
-                    score += piece_score[piece[1]] + piece_position_score
+                    material += piece_score[piece[1]]
+                    white_position += piece_position_score
                 if piece[0] == "b":
-                    score -= piece_score[piece[1]] + piece_position_score * .01
+                    material -= piece_score[piece[1]]
+                    black_position += piece_position_score
 
-    return score
+    return material + white_position - black_position * .01
 
 
 def findRandomMove(valid_moves):
@@ -0,0 +1,57 @@
+"""
+Static evaluation of many positions at once, for offline work such as game analysis and tuning.
+Positions are stacked into an (N, 64) array of piece indices, square = row * 8 + col, and scored with a handful of
+NumPy operations using the same piece values and square tables as AI.scoreBoard. The scores are identical to
+scoreBoard for every position that is not checkmate or stalemate, which the batch does not detect.
+"""
+import numpy
+
+from ChessEngine import PIECES, createGameState
+from PieceTables import piece_position_scores, piece_score
+
+EMPTY = len(PIECES)  # index of an empty square
+PIECE_INDEX = {piece: index for index, piece in enumerate(PIECES)}
+PIECE_INDEX['--'] = EMPTY
+
+SQUARES = numpy.arange(64)
+# signed material per piece index, white positive, and the square table of each side (zero rows for the other side,
+# kings and empty squares)
+MATERIAL = numpy.zeros(EMPTY + 1, dtype=numpy.int64)
+WHITE_SQUARES = numpy.zeros((EMPTY + 1, 64), dtype=numpy.int64)
+BLACK_SQUARES = numpy.zeros((EMPTY + 1, 64), dtype=numpy.int64)
+for _index, _piece in enumerate(PIECES):
+    MATERIAL[_index] = piece_score[_piece[1]] if _piece[0] == 'w' else -piece_score[_piece[1]]
+    if _piece in piece_position_scores:
+        (WHITE_SQUARES if _piece[0] == 'w' else BLACK_SQUARES)[_index] = piece_position_scores[_piece].flatten()
+
+
+def boardIndices(board):
+    return [PIECE_INDEX[piece] for row in board for piece in row]
+
+
+def stackPositions(game_states):
+    """
+    (N, 64) piece index array of the boards of game_states, any backend.
+    """
+    return numpy.array([boardIndices(game_state.board) for game_state in game_states], dtype=numpy.int8)
+
+
+def stackFens(fens):
+    game_state = createGameState()
+    rows = []
+    for fen in fens:
+        game_state.loadFen(fen)
+        rows.append(boardIndices(game_state.board))
+    return numpy.array(rows, dtype=numpy.int8).reshape(len(rows), 64)
+
+
+def scoreBoards(indices):
+    """
+    scoreBoard of every position in an (N, 64) piece index array, as a float64 array of N scores.
+    """
+    indices = numpy.asarray(indices, dtype=numpy.intp).reshape(-1, 64)
+    material = MATERIAL[indices].sum(axis=1)
+    white_position = WHITE_SQUARES[indices, SQUARES].sum(axis=1)
+    black_position = BLACK_SQUARES[indices, SQUARES].sum(axis=1)
+    # same operations in the same order as scoreBoard, so the floating point results match exactly
+    return material + white_position - black_position * .01
@@ -2,8 +2,96 @@
 This class is responsible for storing information of about the current state of chess game.
 It will also responsible for determining valid moves at current state and keep a move log
 '''
+import random
+
 import numpy
 
+from PieceTables import piece_position_scores, piece_score
+
+PIECES = ('wp', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bp', 'bN', 'bB', 'bR', 'bQ', 'bK')
+
+# evaluation terms per piece as flat python lists indexed by row * 8 + col, kings have no square table
+PIECE_VALUES = {piece: piece_score[piece[1]] for piece in PIECES}
+PIECE_SQUARES = {piece: [int(value) for value in piece_position_scores[piece].flatten()]
+                 if piece in piece_position_scores else [0] * 64 for piece in PIECES}
+
+'''
+Zobrist keys, one random 64-bit number per (piece, square), castling rights mask, en passant file and side to move.
+The generator is seeded so keys, and therefore hashes, are the same in every process.
+'''
+_zobrist_random = random.Random(20240601)
+ZOBRIST_PIECES = {piece: [_zobrist_random.getrandbits(64) for _ in range(64)] for piece in PIECES}
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]
+ZOBRIST_ENPASSANT = [_zobrist_random.getrandbits(64) for _ in range(8)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+
+
+# castling rights are a 4-bit mask, which is also the index into ZOBRIST_CASTLING
+WHITE_KING_SIDE = 1
+WHITE_QUEEN_SIDE = 2
+BLACK_KING_SIDE = 4
+BLACK_QUEEN_SIDE = 8
+ALL_CASTLING = 15
+# rights that survive a move from or to each square: moving a king or rook, or capturing a rook, drops them
+CASTLING_KEPT = [ALL_CASTLING] * 64
+CASTLING_KEPT[0] ^= BLACK_QUEEN_SIDE
+CASTLING_KEPT[4] ^= BLACK_KING_SIDE | BLACK_QUEEN_SIDE
+CASTLING_KEPT[7] ^= BLACK_KING_SIDE
+CASTLING_KEPT[56] ^= WHITE_QUEEN_SIDE
+CASTLING_KEPT[60] ^= WHITE_KING_SIDE | WHITE_QUEEN_SIDE
+CASTLING_KEPT[63] ^= WHITE_KING_SIDE
+# FEN letter of each right and the (row, col) of the king and rook it needs on their home squares
+CASTLING_LETTERS = {'K': (WHITE_KING_SIDE, 'wK', (7, 4), 'wR', (7, 7)),
+                    'Q': (WHITE_QUEEN_SIDE, 'wK', (7, 4), 'wR', (7, 0)),
+                    'k': (BLACK_KING_SIDE, 'bK', (0, 4), 'bR', (0, 7)),
+                    'q': (BLACK_QUEEN_SIDE, 'bK', (0, 4), 'bR', (0, 0))}
+
+NO_SQUARE = -1
+# undo stack entries: castling rights in the low 4 bits, en passant file + 1 above them (0 for none), so every entry
+# is a small int and pushing one allocates nothing
+ENPASSANT_SHIFT = 4
+
+STARTING_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+FEN_TO_PIECE = {'P': 'wp', 'N': 'wN', 'B': 'wB', 'R': 'wR', 'Q': 'wQ', 'K': 'wK',
+                'p': 'bp', 'n': 'bN', 'b': 'bB', 'r': 'bR', 'q': 'bQ', 'k': 'bK'}
+PIECE_TO_FEN = {piece: char for char, piece in FEN_TO_PIECE.items()}
+
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2), (1, -2))
+KING_OFFSETS = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))  # orthogonal, then diagonal
+
+
+'''
+Mailbox lookup tables, built once at import so the GameState generators do no offset arithmetic or bounds checks.
+Targets are (row, col, row * 8 + col) triples.
+'''
+
+
+def _buildTargets(offsets):
+    return tuple(tuple((row + d_row, col + d_col, (row + d_row) * 8 + col + d_col) for d_row, d_col in offsets
+                       if 0 <= row + d_row <= 7 and 0 <= col + d_col <= 7)
+                 for row in range(8) for col in range(8))
+
+
+def _buildRayTargets(row, col):
+    rays = []
+    for d_row, d_col in KING_OFFSETS:
+        ray = []
+        end_row, end_col = row + d_row, col + d_col
+        while 0 <= end_row <= 7 and 0 <= end_col <= 7:
+            ray.append((end_row, end_col, end_row * 8 + end_col))
+            end_row += d_row
+            end_col += d_col
+        rays.append(tuple(ray))
+    return tuple(rays)
+
+
+KNIGHT_TARGETS = _buildTargets(KNIGHT_OFFSETS)
+KING_TARGETS = _buildTargets(KING_OFFSETS)
+# RAY_TARGETS[square][direction]: squares from square outward along KING_OFFSETS[direction], nearest first
+RAY_TARGETS = tuple(_buildRayTargets(row, col) for row in range(8) for col in range(8))
+SLIDER_DIRECTIONS = {'R': range(4), 'B': range(4, 8), 'Q': range(8)}  # indices into KING_OFFSETS
+PROMOTION_RANKS = {'w': 0xFF, 'b': 0xFF << 56}  # squares a pawn of each colour promotes on
+
 
 class GameState:
     def __init__(self, is_black):
@@ -28,18 +116,53 @@ class GameState:
         self.WhiteKingpos = (7, 4)
         self.BlackKingpos = (0, 4)
         self.in_check = False
-        self.pins = []
-        self.checks = []
+        self.pin_masks = {}  # square of every pinned piece: bitmask of the line from the king to the pinner
+        self.check_mask = FULL_BOARD  # squares that capture or block the check, 0 in double check
+        self.target_mask = FULL_BOARD  # squares pieces may move to, only the enemy pieces when generating captures
+        self.push_mask = FULL_BOARD  # squares pawns may push to, only the promotion rank when generating captures
         self.checkMate = False
         self.staleMate = False
-        self.enpassantPossible = ()  # square where en passant captured is possible\
-        self.enpassantPossibleLog = [self.enpassantPossible]
-        self.currentCastlingRight = CastleRight(True, True, True, True)
-        self.Castlinglog = [
-            CastleRight(self.currentCastlingRight.wks, self.currentCastlingRight.wqs, self.currentCastlingRight.bks,
-                        self.currentCastlingRight.bqs)]
+        self.enpassantSquare = NO_SQUARE  # square (row * 8 + col) where an en passant capture is possible
+        self.castleRights = ALL_CASTLING
+        self.stateLog = [ALL_CASTLING]  # castling rights and en passant file before every move, in step with move_log
+        self.danger_key = None  # position the cached danger_squares belong to
+        self.danger_squares = 0
+        self.zobristHash = self.computeZobristHash()
+        self.hashLog = [self.zobristHash]  # hash of every position in the game, in step with move_log
+        # white minus black material, and the square table totals of each side, kept up to date by makeMove/undoMove
+        self.material, self.whitePosition, self.blackPosition = self.computeEvaluation()
+        self.halfmoveClock = 0  # plies since the last capture or pawn move, for the fifty-move rule
+        self.halfmoveLog = []  # clock before every move, in step with move_log
+        self.pieceCount = 32  # pieces on the board including kings, insufficient material needs a count of 4 or less
+        self.initialFullmoveNumber = 1  # counters of the position the move log starts from
+        self.initialWhiteToMove = True
 
     def makeMove(self, move):
+        zobrist = self.zobristHash ^ ZOBRIST_BLACK_TO_MOVE
+        zobrist ^= ZOBRIST_CASTLING[self.castleRights]
+        zobrist ^= ZOBRIST_PIECES[move.pieceMoved][move.startRow * 8 + move.startCol]
+        if move.isPawnPromotion:
+            zobrist ^= ZOBRIST_PIECES[move.pieceMoved[0] + 'Q'][move.endRow * 8 + move.endCol]
+        else:
+            zobrist ^= ZOBRIST_PIECES[move.pieceMoved][move.endRow * 8 + move.endCol]
+        if move.isEnPassantMove:
+            zobrist ^= ZOBRIST_PIECES[move.pieceCaptured][move.startRow * 8 + move.endCol]
+        elif move.pieceCaptured != '--':
+            zobrist ^= ZOBRIST_PIECES[move.pieceCaptured][move.endRow * 8 + move.endCol]
+        if self.enpassantSquare != NO_SQUARE:
+            zobrist ^= ZOBRIST_ENPASSANT[self.enpassantSquare & 7]
+            self.stateLog.append(self.castleRights | ((self.enpassantSquare & 7) + 1) << ENPASSANT_SHIFT)
+        else:
+            self.stateLog.append(self.castleRights)
+        self.halfmoveLog.append(self.halfmoveClock)
+        if move.pieceCaptured != '--':
+            self.halfmoveClock = 0
+            self.pieceCount -= 1
+        elif move.pieceMoved[1] == 'p':
+            self.halfmoveClock = 0
+        else:
+            self.halfmoveClock += 1
+
         self.board[move.startRow][move.startCol] = '--'
         self.board[move.endRow][move.endCol] = move.pieceMoved
         self.move_log.append(move)
@@ -59,26 +182,270 @@ class GameState:
             self.board[move.startRow][move.endCol] = '--'
 
         if move.pieceMoved[1] == 'p' and abs(move.startRow - move.endRow) == 2:
-            self.enpassantPossible = ((move.startRow + move.endRow) // 2, move.startCol)
+            self.enpassantSquare = (move.startRow + move.endRow) // 2 * 8 + move.startCol
+            zobrist ^= ZOBRIST_ENPASSANT[move.startCol]
         else:
-            self.enpassantPossible = ()
+            self.enpassantSquare = NO_SQUARE
 
         # castle moves
         if move.isCastleMove:
+            rook_keys = ZOBRIST_PIECES[move.pieceMoved[0] + 'R']
             if move.endCol - move.startCol == 2:  # king side move
                 self.board[move.endRow][move.endCol - 1] = self.board[move.endRow][move.endCol + 1]
                 self.board[move.endRow][move.endCol + 1] = '--'
+                zobrist ^= rook_keys[move.endRow * 8 + move.endCol + 1] ^ rook_keys[move.endRow * 8 + move.endCol - 1]
 
             else:  # queen side move
                 self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 2]
                 self.board[move.endRow][move.endCol - 2] = '--'
+                zobrist ^= rook_keys[move.endRow * 8 + move.endCol - 2] ^ rook_keys[move.endRow * 8 + move.endCol + 1]
+
+        # update castle rights whenever a king or rook leaves its square or a rook is captured on it
+        self.castleRights &= CASTLING_KEPT[move.startRow * 8 + move.startCol] & \
+                             CASTLING_KEPT[move.endRow * 8 + move.endCol]
+        self.zobristHash = zobrist ^ ZOBRIST_CASTLING[self.castleRights]
+        self.hashLog.append(self.zobristHash)
+        self.updateEvaluation(move, 1)
 
-        self.enpassantPossibleLog.append(self.enpassantPossible)
-        # update castle rights whenever it is a king or rook move
-        self.updateCastleRights(move)
-        self.Castlinglog.append(
-            CastleRight(self.currentCastlingRight.wks, self.currentCastlingRight.wqs, self.currentCastlingRight.bks,
-                        self.currentCastlingRight.bqs))
+    '''
+    Material and square table totals computed from scratch, makeMove and undoMove keep them up to date
+    '''
+
+    def computeEvaluation(self):
+        material = white_position = black_position = 0
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece[0] == 'w':
+                    material += PIECE_VALUES[piece]
+                    white_position += PIECE_SQUARES[piece][row * 8 + col]
+                elif piece[0] == 'b':
+                    material -= PIECE_VALUES[piece]
+                    black_position += PIECE_SQUARES[piece][row * 8 + col]
+        return material, white_position, black_position
+
+    '''
+    Add (sign 1) or take back (sign -1) the material and square table changes of a move
+    '''
+
+    def updateEvaluation(self, move, sign):
+        start = move.startRow * 8 + move.startCol
+        end = move.endRow * 8 + move.endCol
+        placed = move.pieceMoved[0] + 'Q' if move.isPawnPromotion else move.pieceMoved
+        material = PIECE_VALUES[placed] - PIECE_VALUES[move.pieceMoved]
+        position = PIECE_SQUARES[placed][end] - PIECE_SQUARES[move.pieceMoved][start]
+        if move.isCastleMove:
+            rook_squares = PIECE_SQUARES[move.pieceMoved[0] + 'R']
+            if move.endCol - move.startCol == 2:  # king side move
+                position += rook_squares[end - 1] - rook_squares[end + 1]
+            else:  # queen side move
+                position += rook_squares[end + 1] - rook_squares[end - 2]
+        captured_position = 0
+        if move.pieceCaptured != '--':
+            captured_square = move.startRow * 8 + move.endCol if move.isEnPassantMove else end
+            material += PIECE_VALUES[move.pieceCaptured]
+            captured_position = PIECE_SQUARES[move.pieceCaptured][captured_square]
+        if move.pieceMoved[0] == 'w':
+            self.material += sign * material
+            self.whitePosition += sign * position
+            self.blackPosition -= sign * captured_position
+        else:
+            self.material -= sign * material
+            self.blackPosition += sign * position
+            self.whitePosition -= sign * captured_position
+
+    '''
+    Hash of the current position computed from scratch, makeMove and undoMove keep zobristHash equal to it
+    '''
+
+    def computeZobristHash(self):
+        zobrist = ZOBRIST_CASTLING[self.castleRights]
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != '--':
+                    zobrist ^= ZOBRIST_PIECES[piece][row * 8 + col]
+        if self.enpassantSquare != NO_SQUARE:
+            zobrist ^= ZOBRIST_ENPASSANT[self.enpassantSquare & 7]
+        if not self.WhiteToMove:
+            zobrist ^= ZOBRIST_BLACK_TO_MOVE
+        return zobrist
+
+    '''
+    Replace the position with the one described by a FEN string, the move log starts empty.
+    A game state can be reused to load many positions, which is much cheaper than building a new one each time.
+    '''
+
+    def loadFen(self, fen):
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError('FEN needs at least placement, side to move, castling and en passant fields: %r' % fen)
+        # hash and evaluation are summed while parsing rather than by a second scan of the board
+        zobrist = material = white_position = black_position = 0
+        rows = []
+        kings = {'wK': [], 'bK': []}
+        for row, rank in enumerate(fields[0].split('/')):
+            squares = []
+            for char in rank:
+                piece = FEN_TO_PIECE.get(char)
+                if piece is not None:
+                    square = row * 8 + len(squares)
+                    zobrist ^= ZOBRIST_PIECES[piece][square]
+                    if piece[0] == 'w':
+                        material += PIECE_VALUES[piece]
+                        white_position += PIECE_SQUARES[piece][square]
+                    else:
+                        material -= PIECE_VALUES[piece]
+                        black_position += PIECE_SQUARES[piece][square]
+                    if piece in kings:
+                        kings[piece].append((row, len(squares)))
+                    squares.append(piece)
+                elif char in '12345678':
+                    squares.extend(['--'] * int(char))
+                else:
+                    raise ValueError('bad piece %r in FEN %r' % (char, fen))
+            if len(squares) != 8:
+                raise ValueError('rank %d does not have 8 squares in FEN %r' % (8 - row, fen))
+            rows.append(squares)
+        if len(rows) != 8:
+            raise ValueError('FEN %r does not have 8 ranks' % fen)
+        for king, squares in kings.items():
+            if len(squares) != 1:
+                raise ValueError('FEN %r needs exactly one %s king, not %d' %
+                                 (fen, 'white' if king == 'wK' else 'black', len(squares)))
+        if fields[1] not in ('w', 'b'):
+            raise ValueError('bad side to move %r in FEN %r' % (fields[1], fen))
+        white_to_move = fields[1] == 'w'
+        if fields[3] == '-':
+            enpassant_square = NO_SQUARE
+        else:
+            # the square the pawn skipped, on the sixth rank from the side to move
+            file, rank = fields[3][:1], fields[3][1:]
+            if file not in Move.filesToCols or rank != ('6' if white_to_move else '3'):
+                raise ValueError('bad en passant square %r in FEN %r' % (fields[3], fen))
+            enpassant_square = Move.ranksToRows[rank] * 8 + Move.filesToCols[file]
+        castle_rights = 0
+        if fields[2] != '-':
+            for letter in fields[2]:
+                if letter not in CASTLING_LETTERS:
+                    raise ValueError('bad castling rights %r in FEN %r' % (fields[2], fen))
+                # a right whose king or rook has left its home square is dropped, as a move would have
+                right, king, (king_row, king_col), rook, (rook_row, rook_col) = CASTLING_LETTERS[letter]
+                if rows[king_row][king_col] == king and rows[rook_row][rook_col] == rook:
+                    castle_rights |= right
+        try:
+            halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+            fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError('bad move counters in FEN %r' % fen)
+        if halfmove_clock < 0 or fullmove_number < 0:
+            raise ValueError('negative move counters in FEN %r' % fen)
+        self.board[:] = rows
+        self.WhiteKingpos, self.BlackKingpos = kings['wK'][0], kings['bK'][0]
+        self.WhiteToMove = white_to_move
+        self.castleRights = castle_rights
+        self.enpassantSquare = enpassant_square
+        self.stateLog = [self.castleRights]
+        self.halfmoveClock = halfmove_clock
+        self.halfmoveLog = []
+        self.pieceCount = sum(1 for squares in rows for piece in squares if piece != '--')
+        self.initialFullmoveNumber = fullmove_number
+        self.initialWhiteToMove = self.WhiteToMove
+        self.move_log = []
+        self.in_check = False
+        self.checkMate = False
+        self.staleMate = False
+        self.danger_key = None
+        zobrist ^= ZOBRIST_CASTLING[self.castleRights]
+        if self.enpassantSquare != NO_SQUARE:
+            zobrist ^= ZOBRIST_ENPASSANT[self.enpassantSquare & 7]
+        if not self.WhiteToMove:
+            zobrist ^= ZOBRIST_BLACK_TO_MOVE
+        self.zobristHash = zobrist
+        self.hashLog = [zobrist]
+        self.material, self.whitePosition, self.blackPosition = material, white_position, black_position
+
+    def getFen(self):
+        ranks = []
+        for row in self.board:
+            rank = ''
+            empty = 0
+            for piece in row:
+                if piece == '--':
+                    empty += 1
+                else:
+                    if empty:
+                        rank += str(empty)
+                        empty = 0
+                    rank += PIECE_TO_FEN[piece]
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        rights = self.castleRights
+        castling = ('K' if rights & WHITE_KING_SIDE else '') + ('Q' if rights & WHITE_QUEEN_SIDE else '') + \
+                   ('k' if rights & BLACK_KING_SIDE else '') + ('q' if rights & BLACK_QUEEN_SIDE else '')
+        if self.enpassantSquare == NO_SQUARE:
+            enpassant = '-'
+        else:
+            enpassant = Move.colstoFiles[self.enpassantSquare & 7] + Move.rowsToRanks[self.enpassantSquare >> 3]
+        fullmove_number = self.initialFullmoveNumber + (len(self.move_log) + (not self.initialWhiteToMove)) // 2
+        return '%s %s %s %s %d %d' % ('/'.join(ranks), 'w' if self.WhiteToMove else 'b', castling or '-', enpassant,
+                                      self.halfmoveClock, fullmove_number)
+
+    '''
+    Earlier occurrences of the current position at or after hashLog index first_ply. Only positions since the last
+    capture or pawn move can repeat, and only every second ply with the same side to move.
+    '''
+
+    def repetitionCount(self, first_ply=0):
+        hash_log = self.hashLog
+        current = len(hash_log) - 1
+        first = max(current - self.halfmoveClock, first_ply, 0)
+        position = hash_log[current]
+        count = 0
+        for ply in range(current - 4, first - 1, -2):  # the same position comes back 4 plies later at the earliest
+            if hash_log[ply] == position:
+                count += 1
+        return count
+
+    def isThreefoldRepetition(self):
+        return self.repetitionCount() >= 2
+
+    def isFiftyMoveDraw(self):
+        return self.halfmoveClock >= 100
+
+    '''
+    Neither side can ever mate: bare kings, a single minor piece, or one bishop each on squares of the same colour
+    '''
+
+    def isInsufficientMaterial(self):
+        if self.pieceCount > 4:
+            return False
+        pieces = []
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != '--' and piece[1] != 'K':
+                    if piece[1] not in 'NB':
+                        return False
+                    pieces.append((piece, (row + col) % 2))
+        if len(pieces) <= 1:
+            return True
+        (first, first_colour), (second, second_colour) = pieces
+        return first[1] == second[1] == 'B' and first[0] != second[0] and first_colour == second_colour
+
+    '''
+    Reason the game is drawn by rule, or None. Stalemate is reported by getValidMoves as before.
+    '''
+
+    def drawReason(self):
+        if self.isFiftyMoveDraw():
+            return 'fifty-move rule'
+        if self.isThreefoldRepetition():
+            return 'threefold repetition'
+        if self.isInsufficientMaterial():
+            return 'insufficient material'
+        return None
 
     '''
     Undo last move 
@@ -91,9 +458,9 @@ class GameState:
             self.board[last_move.endRow][last_move.endCol] = last_move.pieceCaptured
             self.WhiteToMove = not self.WhiteToMove  # switch turn
             # update king location if moved
-            if last_move.pieceMoved == 'wk':
+            if last_move.pieceMoved == 'wK':
                 self.WhiteKingpos = (last_move.startRow, last_move.startCol)
-            elif last_move.pieceMoved == 'bk':
+            elif last_move.pieceMoved == 'bK':
                 self.BlackKingpos = (last_move.startRow, last_move.startCol)
 
             # undo en passant
@@ -101,12 +468,13 @@ class GameState:
                 self.board[last_move.endRow][last_move.endCol] = '--'
                 self.board[last_move.startRow][last_move.endCol] = last_move.pieceCaptured
 
-            self.enpassantPossibleLog.pop()
-            self.enpassantPossible = self.enpassantPossibleLog[-1]
-
-            # undo castle right
-            self.Castlinglog.pop()
-            self.currentCastlingRight = self.Castlinglog[-1]
+            self.popState()
+            self.hashLog.pop()
+            self.zobristHash = self.hashLog[-1]
+            self.halfmoveClock = self.halfmoveLog.pop()
+            if last_move.pieceCaptured != '--':
+                self.pieceCount += 1
+            self.updateEvaluation(last_move, -1)
 
             # undo castle move
             if last_move.isCastleMove:
@@ -124,43 +492,61 @@ class GameState:
             self.staleMate = False
 
     '''
-    Update current castle rights given a move
-    '''
-
-    def updateCastleRights(self, move):
-        if move.pieceMoved == 'wk':
-            self.currentCastlingRight.wqs = False
-            self.currentCastlingRight.wks = False
-        elif move.pieceMoved == 'bk':
-            self.currentCastlingRight.bks = False
-            self.currentCastlingRight.bqs = False
-        elif move.pieceMoved == 'wR':
-            if move.startRow == 7:
-                if move.startCol == 0:  # left rook
-                    self.currentCastlingRight.wqs = False
-                elif move.startCol == 7:  # right rook
-                    self.currentCastlingRight.wks = False
-        elif move.pieceMoved == 'bR':
-            if move.startRow == 0:
-                if move.startCol == 0:  # left rook
-                    self.currentCastlingRight.wqs = False
-                elif move.startCol == 7:  # right rook
-                    self.currentCastlingRight.wks = False
-
-        # if piece captured is rook
-
-        elif move.pieceCaptured == 'wR':
-            if move.endRow == 7:
-                if move.endCol == 0:  # left rook
-                    self.currentCastlingRight.wqs = False
-                elif move.endCol == 7:  # right rook
-                    self.currentCastlingRight.wks = False
-        elif move.pieceCaptured == 'bR':
-            if move.endRow == 0:
-                if move.endCol == 0:  # left rook
-                    self.currentCastlingRight.wqs = False
-                elif move.endCol == 7:  # right rook
-                    self.currentCastlingRight.wks = False
+    Undo castle rights and en passant square, called with the side to move already switched back
+    '''
+
+    def popState(self):
+        state = self.stateLog.pop()
+        self.castleRights = state & ALL_CASTLING
+        enpassant_file = (state >> ENPASSANT_SHIFT) - 1
+        if enpassant_file == NO_SQUARE:
+            self.enpassantSquare = NO_SQUARE
+        else:  # the square behind the pawn that moved two squares, on the side of the player to move
+            self.enpassantSquare = (16 if self.WhiteToMove else 40) + enpassant_file
+
+    '''
+    Pass the turn without moving, for null-move pruning. The move log gets a None entry that undoNullMove takes back.
+    The halfmove clock restarts, so positions before the null move never count as repetitions after it.
+    '''
+
+    def makeNullMove(self):
+        zobrist = self.zobristHash ^ ZOBRIST_BLACK_TO_MOVE
+        if self.enpassantSquare != NO_SQUARE:
+            zobrist ^= ZOBRIST_ENPASSANT[self.enpassantSquare & 7]
+            self.stateLog.append(self.castleRights | ((self.enpassantSquare & 7) + 1) << ENPASSANT_SHIFT)
+            self.enpassantSquare = NO_SQUARE
+        else:
+            self.stateLog.append(self.castleRights)
+        self.halfmoveLog.append(self.halfmoveClock)
+        self.halfmoveClock = 0
+        self.move_log.append(None)
+        self.WhiteToMove = not self.WhiteToMove
+        self.zobristHash = zobrist
+        self.hashLog.append(zobrist)
+
+    def undoNullMove(self):
+        self.move_log.pop()
+        self.WhiteToMove = not self.WhiteToMove
+        self.popState()
+        self.hashLog.pop()
+        self.zobristHash = self.hashLog[-1]
+        self.halfmoveClock = self.halfmoveLog.pop()
+        self.checkMate = False
+        self.staleMate = False
+
+    '''
+    Whether the side to move has a knight, bishop, rook or queen. Without one, passing is often the best move
+    (zugzwang), so the search does not try null moves.
+    '''
+
+    def hasNonPawnMaterial(self):
+        ally_color = 'w' if self.WhiteToMove else 'b'
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece[0] == ally_color and piece[1] in 'NBRQ':
+                    return True
+        return False
 
     '''
     All moves considering checks
@@ -170,73 +556,96 @@ class GameState:
         """
         All moves considering checks.
         """
-        temp_castle_rights = CastleRight(self.currentCastlingRight.wks, self.currentCastlingRight.bks,
-                                         self.currentCastlingRight.wqs, self.currentCastlingRight.bqs)
         # advanced algorithm
-        moves = []
-        self.in_check, self.pins, self.checks = self.checkForPinsAndChecks()
-
+        self.in_check, self.pin_masks, self.check_mask = self.checkForPinsAndChecks()
         if self.WhiteToMove:
-            king_row = self.WhiteKingpos[0]
-            king_col = self.WhiteKingpos[1]
+            king_row, king_col = self.WhiteKingpos
         else:
-            king_row = self.BlackKingpos[0]
-            king_col = self.BlackKingpos[1]
-        if self.in_check:
-            if len(self.checks) == 1:  # only 1 check, block the check or move the king
-                moves = self.getAllPossibleMoves()
-                # to block the check you must put a piece into one of the squares between the enemy piece and your king
-                check = self.checks[0]  # check information
-                check_row = check[0]
-                check_col = check[1]
-                piece_checking = self.board[check_row][check_col]
-                valid_squares = []  # squares that pieces can move to
-                # if knight, must capture the knight or move your king, other pieces can be blocked
-                if piece_checking[1] == "N":
-                    valid_squares = [(check_row, check_col)]
-                else:
-                    for i in range(1, 8):
-                        valid_square = (king_row + check[2] * i,
-                                        king_col + check[3] * i)  # check[2] and check[3] are the check directions
-                        valid_squares.append(valid_square)
-                        if valid_square[0] == check_row and valid_square[
-                            1] == check_col:  # once you get to piece and check
-                            break
-                # get rid of any moves that don't block check or move king
-                for i in range(len(moves) - 1, -1, -1):  # iterate through the list backwards when removing elements
-                    if moves[i].pieceMoved[1] != "K":  # move doesn't move king so it must block or capture
-                        if not (moves[i].endRow,
-                                moves[i].endCol) in valid_squares:  # move doesn't block or capture piece
-                            moves.remove(moves[i])
-            else:  # double check, king has to move
-                self.getKingMoves(king_row, king_col, moves)
-        else:  # not in check - all moves are fine
+            king_row, king_col = self.BlackKingpos
+        if self.check_mask == 0:  # double check, king has to move
+            moves = []
+            self.getKingMoves(king_row, king_col, moves)
+        else:  # the piece generators only produce moves that respect the pin and check masks
             moves = self.getAllPossibleMoves()
-            if self.WhiteToMove:
-                self.getCastleMoves(self.WhiteKingpos[0], self.BlackKingpos[1], moves)
-            else:
-                self.getCastleMoves(self.BlackKingpos[0], self.BlackKingpos[1], moves)
+            if not self.in_check:
+                self.getCastleMoves(king_row, king_col, moves)
 
         if len(moves) == 0:
-            if self.inCheck():
+            if self.in_check:
                 self.checkMate = True
             else:
-                # TODO stalemate on repeated moves
                 self.staleMate = True
         else:
             self.checkMate = False
             self.staleMate = False
 
-        self.currentCastlingRight = temp_castle_rights
         return moves
 
     '''
-    Return if player is in check, a list of pins, a list of checks
+    Legal captures and promotions for the quiescence search, generated without the quiet moves by limiting the
+    piece targets to enemy squares and pawn pushes to the promotion rank. Game over flags are left untouched
+    '''
+
+    def getCaptureMoves(self):
+        self.in_check, self.pin_masks, self.check_mask = self.checkForPinsAndChecks()
+        if self.WhiteToMove:
+            ally_color, enemy_color, promotion_rank = 'w', 'b', PROMOTION_RANKS['w']
+            king_row, king_col = self.WhiteKingpos
+        else:
+            ally_color, enemy_color, promotion_rank = 'b', 'w', PROMOTION_RANKS['b']
+            king_row, king_col = self.BlackKingpos
+        enemy_squares = 0
+        pieces = []
+        for row, squares in enumerate(self.board.tolist()):
+            for col, piece in enumerate(squares):
+                if piece[0] == enemy_color:
+                    enemy_squares |= 1 << (row * 8 + col)
+                elif piece[0] == ally_color and piece[1] != 'K':
+                    pieces.append((row, col, piece[1]))
+        moves = []
+        if KING_ATTACKS[king_row * 8 + king_col] & enemy_squares:  # skip the attack map when the king can not capture
+            self.getKingMoves(king_row, king_col, moves)
+            moves = [move for move in moves if move.is_capture]
+        if self.check_mask == 0:  # double check, king has to move
+            return moves
+        self.target_mask = enemy_squares
+        self.push_mask = promotion_rank
+        try:
+            for row, col, piece_type in pieces:
+                self.move_function[piece_type](row, col, moves)
+        finally:
+            self.target_mask = self.push_mask = FULL_BOARD
+        return moves
+
+    '''
+    Whether the side to move has any legal move, stopping at the first piece that has one. Sets in_check, the game
+    over flags are left untouched. Castling is never looked at: when it is legal the king can also step towards the rook
+    '''
+
+    def hasLegalMove(self):
+        self.in_check, self.pin_masks, self.check_mask = self.checkForPinsAndChecks()
+        king_row, king_col = self.WhiteKingpos if self.WhiteToMove else self.BlackKingpos
+        moves = []
+        self.getKingMoves(king_row, king_col, moves)
+        if moves or self.check_mask == 0:
+            return len(moves) > 0
+        ally_color = 'w' if self.WhiteToMove else 'b'
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece[0] == ally_color and piece[1] != 'K':
+                    self.move_function[piece[1]](row, col, moves)
+                    if moves:
+                        return True
+        return False
+
+    '''
+    Return if player is in check, the pin mask of every pinned square and the mask of squares that answer the check
     '''
 
     def checkForPinsAndChecks(self):
-        pins = []  # squares pinned and the direction its pinned from
-        checks = []  # squares where enemy is applying a check
+        pin_masks = {}  # pinned square: the line from the king up to and including the pinning piece
+        check_mask = FULL_BOARD  # squares where a piece other than the king may move
         in_check = False
         if self.WhiteToMove:
             enemy_color = "b"
@@ -249,82 +658,106 @@ class GameState:
             start_row = self.BlackKingpos[0]
             start_col = self.BlackKingpos[1]
         # check outwards from king for pins and checks, keep track of pins
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
-        for j in range(len(directions)):
-            direction = directions[j]
-            possible_pin = ()  # reset possible pins
-            for i in range(1, 8):
-                end_row = start_row + direction[0] * i
-                end_col = start_col + direction[1] * i
-                if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                    end_piece = self.board[end_row][end_col]
-                    if end_piece[0] == ally_color and end_piece[1] != "K":
-                        if possible_pin == ():  # first allied piece could be pinned
-                            possible_pin = (end_row, end_col, direction[0], direction[1])
-                        else:  # 2nd allied piece - no check or pin from this direction
+        rays = RAY_TARGETS[start_row * 8 + start_col]
+        for j in range(8):
+            possible_pin = NO_SQUARE  # reset possible pins
+            line = 0  # squares walked so far in this direction
+            for i, (end_row, end_col, end_square) in enumerate(rays[j], 1):
+                line |= 1 << end_square
+                end_piece = self.board[end_row][end_col]
+                if end_piece[0] == ally_color and end_piece[1] != "K":
+                    if possible_pin == NO_SQUARE:  # first allied piece could be pinned
+                        possible_pin = end_square
+                    else:  # 2nd allied piece - no check or pin from this direction
+                        break
+                elif end_piece[0] == enemy_color:
+                    enemy_type = end_piece[1]
+                    # 5 possibilities in this complex conditional
+                    # 1.) orthogonally away from king and piece is a rook
+                    # 2.) diagonally away from king and piece is a bishop
+                    # 3.) 1 square away diagonally from king and piece is a pawn
+                    # 4.) any direction and piece is a queen
+                    # 5.) any direction 1 square away and piece is a king
+                    if (0 <= j <= 3 and enemy_type == "R") or (4 <= j <= 7 and enemy_type == "B") or (
+                            i == 1 and enemy_type == "p" and (
+                            (enemy_color == "w" and 6 <= j <= 7) or (enemy_color == "b" and 4 <= j <= 5))) or (
+                            enemy_type == "Q") or (i == 1 and enemy_type == "K"):
+                        if possible_pin == NO_SQUARE:  # no piece blocking, so check: capture or block on the line
+                            check_mask = line if not in_check else 0
+                            in_check = True
                             break
-                    elif end_piece[0] == enemy_color:
-                        enemy_type = end_piece[1]
-                        # 5 possibilities in this complex conditional
-                        # 1.) orthogonally away from king and piece is a rook
-                        # 2.) diagonally away from king and piece is a bishop
-                        # 3.) 1 square away diagonally from king and piece is a pawn
-                        # 4.) any direction and piece is a queen
-                        # 5.) any direction 1 square away and piece is a king
-                        if (0 <= j <= 3 and enemy_type == "R") or (4 <= j <= 7 and enemy_type == "B") or (
-                                i == 1 and enemy_type == "p" and (
-                                (enemy_color == "w" and 6 <= j <= 7) or (enemy_color == "b" and 4 <= j <= 5))) or (
-                                enemy_type == "Q") or (i == 1 and enemy_type == "K"):
-                            if possible_pin == ():  # no piece blocking, so check
-                                in_check = True
-                                checks.append((end_row, end_col, direction[0], direction[1]))
-                                break
-                            else:  # piece blocking so pin
-                                pins.append(possible_pin)
-                                break
-                        else:  # enemy piece not applying checks
+                        else:  # piece blocking so pin
+                            pin_masks[possible_pin] = line
                             break
-                else:
-                    break  # off board
+                    else:  # enemy piece not applying checks
+                        break
         # check for knight checks
-        knight_moves = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2), (1, -2))
-        for move in knight_moves:
-            end_row = start_row + move[0]
-            end_col = start_col + move[1]
-            if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] == enemy_color and end_piece[1] == "N":  # enemy knight attacking a king
-                    in_check = True
-                    checks.append((end_row, end_col, move[0], move[1]))
-        return in_check, pins, checks
+        for end_row, end_col, end_square in KNIGHT_TARGETS[start_row * 8 + start_col]:
+            end_piece = self.board[end_row][end_col]
+            if end_piece[0] == enemy_color and end_piece[1] == "N":  # enemy knight attacking a king, capture it
+                check_mask = 1 << end_square if not in_check else 0
+                in_check = True
+        return in_check, pin_masks, check_mask
 
     '''
     Determine if current player in check
     '''
 
     def inCheck(self):
-        if self.WhiteToMove:
-            return self.squareUnderAttack(self.WhiteKingpos[0], self.WhiteKingpos[1])
-        else:
-            return self.squareUnderAttack(self.BlackKingpos[0], self.BlackKingpos[1])
+        return self.checkForPinsAndChecks()[0]  # walks out from the king instead of mapping every enemy attack
 
     '''
     Determine if the enemy can attack piece at r, c
     '''
 
     def squareUnderAttack(self, r, c):
-        self.WhiteToMove = not self.WhiteToMove  # switch turn
-        oppMoves = self.getAllPossibleMoves()
-        self.WhiteToMove = not self.WhiteToMove  # switch turn back
+        return self.getAttackMap('b' if self.WhiteToMove else 'w') >> (r * 8 + c) & 1 == 1
 
-        for move in oppMoves:
-            if move.endRow == r and move.endCol == c:
-                return True
+    '''
+    Bitmask (bit row * 8 + col) of every square color attacks, the square at see_through is treated as empty
+    '''
 
-        return False
+    def getAttackMap(self, color, see_through=None):
+        attacks = 0
+        pawn_attacks = PAWN_ATTACKS[color]
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece[0] != color:
+                    continue
+                piece_type = piece[1]
+                square = row * 8 + col
+                if piece_type == 'p':
+                    attacks |= pawn_attacks[square]
+                elif piece_type == 'N':
+                    attacks |= KNIGHT_ATTACKS[square]
+                elif piece_type == 'K':
+                    attacks |= KING_ATTACKS[square]
+                else:
+                    rays = RAY_TARGETS[square]
+                    for direction in SLIDER_DIRECTIONS[piece_type]:
+                        for end_row, end_col, end_square in rays[direction]:
+                            attacks |= 1 << end_square
+                            if self.board[end_row][end_col] != '--' and (end_row, end_col) != see_through:
+                                break
+        return attacks
+
+    '''
+    Squares the king of the side to move may not step on, computed once per position with the king lifted off the
+    board so it cannot hide behind itself on a checking line
+    '''
+
+    def getKingDangerSquares(self):
+        if self.danger_key != self.zobristHash:
+            if self.WhiteToMove:
+                self.danger_squares = self.getAttackMap('b', self.WhiteKingpos)
+            else:
+                self.danger_squares = self.getAttackMap('w', self.BlackKingpos)
+            self.danger_key = self.zobristHash
+        return self.danger_squares
 
     '''
-    All moves without considering checks
+    All moves of the pieces other than castling, restricted to the pin and check masks set by getValidMoves
     '''
 
     def getAllPossibleMoves(self):
@@ -342,30 +775,26 @@ class GameState:
     '''
 
     def getPawnMoves(self, r, c, moves):
-        piece_pinned = False
-        pin_direction = ()
-
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
+        pawn_square = r * 8 + c
+        pin_mask = self.pin_masks.get(pawn_square, FULL_BOARD)
+        allowed = self.check_mask & pin_mask  # squares this pawn may move to
+        push_allowed = allowed & self.push_mask
 
         if self.WhiteToMove:  # White pawns moves
             kingRow, kingCol = self.WhiteKingpos
             if self.board[r - 1][c] == '--':
-                if not piece_pinned or pin_direction == (-1, 0):
+                if push_allowed >> (pawn_square - 8) & 1:
                     moves.append(Move((r, c), (r - 1, c), self.board))
-                    if r == 6 and self.board[r - 2][c] == '--':
-                        moves.append(Move((r, c), (r - 2, c), self.board))
+                if r == 6 and self.board[r - 2][c] == '--' and push_allowed >> (pawn_square - 16) & 1:
+                    moves.append(Move((r, c), (r - 2, c), self.board))
 
             if c > 0:  # Capture left
-                if not piece_pinned or pin_direction == (-1, -1):
-                    if self.board[r - 1][c - 1][0] == 'b':
-
+                if self.board[r - 1][c - 1][0] == 'b':
+                    if allowed >> (pawn_square - 9) & 1:
                         moves.append(Move((r, c), (r - 1, c - 1), self.board))
-                    elif (r - 1, c - 1) == self.enpassantPossible:
+                # en passant answers a check by capturing the pawn that gave it
+                elif pawn_square - 9 == self.enpassantSquare and pin_mask >> (pawn_square - 9) & 1 and \
+                        self.check_mask & (1 << (pawn_square - 9) | 1 << (pawn_square - 1)):
                         attackingPiece = blockingPiece = False
                         if kingRow == r:
                             if kingCol < c:  # king is left of the pawn
@@ -384,17 +813,18 @@ class GameState:
                                 square = self.board[r][i]
                                 if square[0] == 'b' and (square[1] == 'R' or square[1] == 'Q'):
                                     attackingPiece = True
+                                    break
                                 elif square != '--':
-                                    blockingPiece = True
+                                    break  # first piece beyond the pawns shields the king
 
                         if not attackingPiece or blockingPiece:
                             moves.append(Move((r, c), (r - 1, c - 1), self.board, True))
             if c < 7:  # Capture right
-                if not piece_pinned or pin_direction == (-1, 1):
-                    if self.board[r - 1][c + 1][0] == 'b':
-
+                if self.board[r - 1][c + 1][0] == 'b':
+                    if allowed >> (pawn_square - 7) & 1:
                         moves.append(Move((r, c), (r - 1, c + 1), self.board))
-                    elif (r - 1, c + 1) == self.enpassantPossible:
+                elif pawn_square - 7 == self.enpassantSquare and pin_mask >> (pawn_square - 7) & 1 and \
+                        self.check_mask & (1 << (pawn_square - 7) | 1 << (pawn_square + 1)):
                         attackingPiece = blockingPiece = False
                         if kingRow == r:
                             if kingCol < c:  # king is left of the pawn
@@ -413,8 +843,9 @@ class GameState:
                                 square = self.board[r][i]
                                 if square[0] == 'b' and (square[1] == 'R' or square[1] == 'Q'):
                                     attackingPiece = True
+                                    break
                                 elif square != '--':
-                                    blockingPiece = True
+                                    break  # first piece beyond the pawns shields the king
 
                         if not attackingPiece or blockingPiece:
                             moves.append(Move((r, c), (r - 1, c + 1), self.board, True))
@@ -422,17 +853,17 @@ class GameState:
         else:  # black pawns moves
             kingRow, kingCol = self.BlackKingpos
             if self.board[r + 1][c] == '--':
-                if not piece_pinned or pin_direction == (1, 0):
+                if push_allowed >> (pawn_square + 8) & 1:
                     moves.append(Move((r, c), (r + 1, c), self.board))
-                    if r == 1 and self.board[r + 2][c] == '--':
-                        moves.append(Move((r, c), (r + 2, c), self.board))
+                if r == 1 and self.board[r + 2][c] == '--' and push_allowed >> (pawn_square + 16) & 1:
+                    moves.append(Move((r, c), (r + 2, c), self.board))
 
             if c > 0:  # Capture left
-                if not piece_pinned or pin_direction == (1, -1):
-                    if self.board[r + 1][c - 1][0] == 'w':
-
+                if self.board[r + 1][c - 1][0] == 'w':
+                    if allowed >> (pawn_square + 7) & 1:
                         moves.append(Move((r, c), (r + 1, c - 1), self.board))
-                    elif (r + 1, c - 1) == self.enpassantPossible:
+                elif pawn_square + 7 == self.enpassantSquare and pin_mask >> (pawn_square + 7) & 1 and \
+                        self.check_mask & (1 << (pawn_square + 7) | 1 << (pawn_square - 1)):
                         attackingPiece = blockingPiece = False
                         if kingRow == r:
                             if kingCol < c:  # king is left of the pawn
@@ -451,17 +882,18 @@ class GameState:
                                 square = self.board[r][i]
                                 if square[0] == 'w' and (square[1] == 'R' or square[1] == 'Q'):
                                     attackingPiece = True
+                                    break
                                 elif square != '--':
-                                    blockingPiece = True
+                                    break  # first piece beyond the pawns shields the king
 
                         if not attackingPiece or blockingPiece:
                             moves.append(Move((r, c), (r + 1, c - 1), self.board, True))
             if c < 7:  # Capture right
-                if not piece_pinned or pin_direction == (1, 1):
-                    if self.board[r + 1][c + 1][0] == 'w':
-
+                if self.board[r + 1][c + 1][0] == 'w':
+                    if allowed >> (pawn_square + 9) & 1:
                         moves.append(Move((r, c), (r + 1, c + 1), self.board))
-                    elif (r + 1, c + 1) == self.enpassantPossible:
+                elif pawn_square + 9 == self.enpassantSquare and pin_mask >> (pawn_square + 9) & 1 and \
+                        self.check_mask & (1 << (pawn_square + 9) | 1 << (pawn_square + 1)):
                         attackingPiece = blockingPiece = False
                         if kingRow == r:
                             if kingCol < c:  # king is left of the pawn
@@ -480,8 +912,9 @@ class GameState:
                                 square = self.board[r][i]
                                 if square[0] == 'w' and (square[1] == 'R' or square[1] == 'Q'):
                                     attackingPiece = True
+                                    break
                                 elif square != '--':
-                                    blockingPiece = True
+                                    break  # first piece beyond the pawns shields the king
 
                         if not attackingPiece or blockingPiece:
                             moves.append(Move((r, c), (r + 1, c + 1), self.board, True))
@@ -491,34 +924,33 @@ class GameState:
     '''
 
     def getRookMoves(self, r, c, moves):
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                if self.board[r][c][
-                    1] != "Q":  # can't remove queen from pin on rook moves, only remove it on bishop moves
-                    self.pins.remove(self.pins[i])
-                break
-
-        directions = ((0, 1), (0, -1), (1, 0), (-1, 0))  # right, left, down, up
+        self.getSlidingMoves(r, c, SLIDER_DIRECTIONS['R'], moves)
+
+    '''
+    Add the moves along the given directions of RAY_TARGETS that land on the check mask, a pinned piece only walks
+    the directions of its pin line
+    '''
+
+    def getSlidingMoves(self, r, c, directions, moves):
         enemy_color = 'b' if self.WhiteToMove else 'w'
-        for d in directions:
-            for i in range(1, 8):
-                endRow = r + d[0] * i
-                endCol = c + d[1] * i
-                if 0 <= endRow < 8 and 0 <= endCol < 8:  # in board
-                    if not piece_pinned or pin_direction == d or pin_direction == (-d[0], -d[1]):
-                        endPiece = self.board[endRow][endCol]
-                        if endPiece == '--':  # empty space valid
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
-                        elif endPiece[0] == enemy_color:  # enemy piece valid
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
-                            break
-                        else:
-                            break
-                else:  # off board
+        square = r * 8 + c
+        pin_mask = self.pin_masks.get(square, FULL_BOARD)
+        check_mask = self.check_mask & self.target_mask
+        rays = RAY_TARGETS[square]
+        for direction in directions:
+            ray = rays[direction]
+            if not ray or not pin_mask >> ray[0][2] & 1:  # off the board or off the pin line
+                continue
+            for endRow, endCol, end_square in ray:
+                endPiece = self.board[endRow][endCol]
+                if endPiece == '--':  # empty space valid
+                    if check_mask >> end_square & 1:
+                        moves.append(Move((r, c), (endRow, endCol), self.board))
+                elif endPiece[0] == enemy_color:  # enemy piece valid
+                    if check_mask >> end_square & 1:
+                        moves.append(Move((r, c), (endRow, endCol), self.board))
+                    break
+                else:
                     break
 
     '''
@@ -526,73 +958,48 @@ class GameState:
     '''
 
     def getKnightMoves(self, r, c, moves):
-        piece_pinned = False
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piece_pinned = True
-                self.pins.remove(self.pins[i])
-                break
-        knight_moves = ((-2, 1), (-2, -1), (2, -1), (2, 1), (1, -2), (1, 2), (-1, 2), (-1, -2))
+        if r * 8 + c in self.pin_masks:
+            return  # a pinned knight can never stay on the pin line
         ally_color = 'w' if self.WhiteToMove else 'b'
-        for m in knight_moves:
-            endRow = r + m[0]
-            endCol = c + m[1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:  # in board
-                if not piece_pinned:
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece[0] != ally_color:  # empty space and enemy space valid
-                        moves.append(Move((r, c), (endRow, endCol), self.board))
+        check_mask = self.check_mask & self.target_mask
+        for endRow, endCol, end_square in KNIGHT_TARGETS[r * 8 + c]:
+            endPiece = self.board[endRow][endCol]
+            if endPiece[0] != ally_color and check_mask >> end_square & 1:  # empty space and enemy space valid
+                moves.append(Move((r, c), (endRow, endCol), self.board))
 
     '''
             Get all king moves for the king located at row, col and add these to list 
     '''
 
     def getKingMoves(self, row, col, moves):
-        row_moves = (-1, -1, -1, 0, 0, 1, 1, 1)
-        col_moves = (-1, 0, 1, -1, 1, -1, 0, 1)
         ally_color = "w" if self.WhiteToMove else "b"
-        for i in range(8):
-            end_row = row + row_moves[i]
-            end_col = col + col_moves[i]
-            if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] != ally_color:  # not an ally piece - empty or enemy
-                    # place king on end square and check for checks
-                    if ally_color == "w":
-                        self.WhiteKingpos = (end_row, end_col)
-                    else:
-                        self.BlackKingpos = (end_row, end_col)
-                    in_check, pins, checks = self.checkForPinsAndChecks()
-                    if not in_check:
-                        moves.append(Move((row, col), (end_row, end_col), self.board))
-                    # place king back on original location
-                    if ally_color == "w":
-                        self.WhiteKingpos = (row, col)
-                    else:
-                        self.BlackKingpos = (row, col)
+        danger_squares = self.getKingDangerSquares()
+        for end_row, end_col, end_square in KING_TARGETS[row * 8 + col]:
+            end_piece = self.board[end_row][end_col]
+            if end_piece[0] != ally_color:  # not an ally piece - empty or enemy
+                if not danger_squares >> end_square & 1:  # enemy does not attack end square
+                    moves.append(Move((row, col), (end_row, end_col), self.board))
 
     '''
     Generate all valid castle moves of king at row, col and add them to list of moves 
     '''
 
     def getCastleMoves(self, row, col, moves):
-        if self.squareUnderAttack(row, col):
+        if self.getKingDangerSquares() >> (row * 8 + col) & 1:
             return
-        if (self.WhiteToMove and self.currentCastlingRight.wks) or (
-                not self.WhiteToMove and self.currentCastlingRight.bks):
+        if self.castleRights & (WHITE_KING_SIDE if self.WhiteToMove else BLACK_KING_SIDE):
             self.getKingSideCastleMoves(row, col, moves)
-        if (self.WhiteToMove and self.currentCastlingRight.wqs) or (
-                not self.WhiteToMove and self.currentCastlingRight.bqs):
+        if self.castleRights & (WHITE_QUEEN_SIDE if self.WhiteToMove else BLACK_QUEEN_SIDE):
             self.getQueenSideCastleMoves(row, col, moves)
 
     def getKingSideCastleMoves(self, row, col, moves):
         if self.board[row][col + 1] == '--' and self.board[row][col + 2] == '--':
-            if not self.squareUnderAttack(row, col + 1) and not self.squareUnderAttack(row, col + 2):
+            if not self.getKingDangerSquares() & (0b11 << (row * 8 + col + 1)):  # both squares safe
                 moves.append(Move((row, col), (row, col + 2), self.board, castle_move=True))
 
     def getQueenSideCastleMoves(self, row, col, moves):
         if self.board[row][col - 1] == '--' and self.board[row][col - 2] == '--' and self.board[row][col - 3] == '--':
-            if not self.squareUnderAttack(row, col - 1) and not self.squareUnderAttack(row, col - 2):
+            if not self.getKingDangerSquares() & (0b11 << (row * 8 + col - 2)):  # both squares safe
                 moves.append(Move((row, col), (row, col - 2), self.board, castle_move=True))
 
     '''
@@ -600,40 +1007,23 @@ class GameState:
         '''
 
     def getQueenMoves(self, r, c, moves):
-        self.getRookMoves(r, c, moves)
-        self.getBishopMoves(r, c, moves)
+        self.getSlidingMoves(r, c, SLIDER_DIRECTIONS['Q'], moves)
 
     '''
         Get all bishop moves for the bishop located at row, col and add these to list 
     '''
 
     def getBishopMoves(self, r, c, moves):
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
-        directions = ((1, 1), (1, -1), (-1, 1), (-1, -1))  # 4 diagonals
-        enemy_color = 'b' if self.WhiteToMove else 'w'
-        for d in directions:
-            for i in range(1, 8):
-                endRow = r + d[0] * i
-                endCol = c + d[1] * i
-                if 0 <= endRow <= 7 and 0 <= endCol <= 7:  # in board
-                    if not piece_pinned or pin_direction == d or pin_direction == (-d[0], -d[1]):
-                        endPiece = self.board[endRow][endCol]
-                        if endPiece == '--':  # empty space valid
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
-                        elif endPiece[0] == enemy_color:  # enemy piece valid
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
-                            break
-                        else:
-                            break
-                else:  # off board
-                    break
+        self.getSlidingMoves(r, c, SLIDER_DIRECTIONS['B'], moves)
+
+
+# packed move code: start square in bits 0-5, end square in bits 6-11 (square = row * 8 + col), flags above that
+SQUARE_BITS = 6
+CAPTURE_FLAG = 1 << 12
+EN_PASSANT_FLAG = 1 << 13
+CASTLE_FLAG = 1 << 14
+PROMOTION_FLAG = 1 << 15  # always to a queen
+SQUARE_COORDINATES = tuple(divmod(square, 8) for square in range(64))
 
 
 class Move():
@@ -645,23 +1035,55 @@ class Move():
     filesToCols = {'a': 0, 'b': 1, 'c': 2, 'd': 3, 'e': 4, 'f': 5, 'g': 6, 'h': 7}
     colstoFiles = {v: k for k, v in filesToCols.items()}
 
+    __slots__ = ('startRow', 'startCol', 'endRow', 'endCol', 'pieceMoved', 'pieceCaptured', 'isPawnPromotion',
+                 'isEnPassantMove', 'isCastleMove', 'is_capture', 'moveID', 'code')
+
     def __init__(self, startSQ, endSQ, board, enpassant_move=False, castle_move=False):
-        self.startRow = startSQ[0]
-        self.startCol = startSQ[1]
-        self.endRow = endSQ[0]
-        self.endCol = endSQ[1]
-        self.pieceMoved = board[self.startRow][self.startCol]
-        self.pieceCaptured = board[self.endRow][self.endCol]
+        self.setUp(startSQ[0], startSQ[1], endSQ[0], endSQ[1], board,
+                   (EN_PASSANT_FLAG if enpassant_move else 0) | (CASTLE_FLAG if castle_move else 0))
+
+    '''
+    Build a move from square numbers and EN_PASSANT_FLAG / CASTLE_FLAG without going through (row, col) tuples
+    '''
+
+    @classmethod
+    def fromSquares(cls, start, end, board, flags=0):
+        move = cls.__new__(cls)
+        start_row, start_col = SQUARE_COORDINATES[start]
+        end_row, end_col = SQUARE_COORDINATES[end]
+        move.setUp(start_row, start_col, end_row, end_col, board, flags)
+        return move
+
+    '''
+    Move for a packed code, e.g. one read back from the transposition table, in the position of board
+    '''
+
+    @classmethod
+    def fromCode(cls, code, board):
+        return cls.fromSquares(code & 63, (code >> SQUARE_BITS) & 63, board, code & (EN_PASSANT_FLAG | CASTLE_FLAG))
+
+    def setUp(self, start_row, start_col, end_row, end_col, board, flags):
+        self.startRow = start_row
+        self.startCol = start_col
+        self.endRow = end_row
+        self.endCol = end_col
+        self.pieceMoved = piece_moved = board[start_row][start_col]
+        self.pieceCaptured = piece_captured = board[end_row][end_col]
         # pawn promotion
-        self.isPawnPromotion = (self.pieceMoved == 'wp' and self.endRow == 0) or (
-                self.pieceMoved == 'bp' and self.endRow == 7)
+        self.isPawnPromotion = (piece_moved == 'wp' and end_row == 0) or (piece_moved == 'bp' and end_row == 7)
         # en passant
-        self.isEnPassantMove = enpassant_move
-        self.isCastleMove = castle_move
-        self.is_capture = self.pieceCaptured != "--"
+        self.isEnPassantMove = flags & EN_PASSANT_FLAG != 0
+        self.isCastleMove = flags & CASTLE_FLAG != 0
+        self.is_capture = piece_captured != "--"
         if self.isEnPassantMove:
-            self.pieceCaptured = 'wp' if self.pieceMoved == 'bp' else 'bp'
-        self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
+            self.pieceCaptured = 'wp' if piece_moved == 'bp' else 'bp'
+        # from and to squares identify a move in its position, the flags make the code decodable on its own
+        self.moveID = move_id = start_row * 8 + start_col | (end_row * 8 + end_col) << SQUARE_BITS
+        if self.is_capture:
+            flags |= CAPTURE_FLAG
+        if self.isPawnPromotion:
+            flags |= PROMOTION_FLAG
+        self.code = move_id | flags
 
     '''
     Overriding equal method
@@ -672,6 +1094,9 @@ class Move():
             return self.moveID == other.moveID
         return False
 
+    def __hash__(self):
+        return self.moveID
+
     def getChessNotation(self):
         return self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol)
 
@@ -696,9 +1121,484 @@ class Move():
         return move_string + end_square
 
 
-class CastleRight:
-    def __init__(self, wks, wqs, bks, bqs):
-        self.wks = wks
-        self.wqs = wqs
-        self.bks = bks
-        self.bqs = bqs
+'''
+Bitboard backend
+Squares are numbered row * 8 + col, so bit 0 is a8 and bit 63 is h1, the same layout as board[row][col]
+'''
+
+PIECE_NAMES = {'w': PIECES[:6], 'b': PIECES[6:]}  # pawn, knight, bishop, rook, queen, king of each colour
+FULL_BOARD = (1 << 64) - 1
+NOT_A_FILE = FULL_BOARD ^ sum(1 << (row * 8) for row in range(8))
+NOT_H_FILE = FULL_BOARD ^ sum(1 << (row * 8 + 7) for row in range(8))
+
+# same order as checkForPinsAndChecks: 4 orthogonal directions first, then the 4 diagonals
+DIRECTIONS = KING_OFFSETS
+# directions walking towards higher square numbers, the nearest blocker on those rays is the lowest set bit
+POSITIVE_DIRECTIONS = (False, False, True, True, False, False, True, True)
+
+
+def _buildLeaperTable(offsets):
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        targets = 0
+        for d_row, d_col in offsets:
+            if 0 <= row + d_row <= 7 and 0 <= col + d_col <= 7:
+                targets |= 1 << ((row + d_row) * 8 + col + d_col)
+        table.append(targets)
+    return table
+
+
+def _buildRayTable(direction):
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        ray = 0
+        row, col = row + direction[0], col + direction[1]
+        while 0 <= row <= 7 and 0 <= col <= 7:
+            ray |= 1 << (row * 8 + col)
+            row, col = row + direction[0], col + direction[1]
+        table.append(ray)
+    return table
+
+
+def _buildBetweenTable():
+    between = [[0] * 64 for _ in range(64)]
+    for rays in RAYS:
+        for square in range(64):
+            targets = rays[square]
+            while targets:
+                target_bit = targets & -targets
+                target = target_bit.bit_length() - 1
+                between[square][target] = rays[square] & ~rays[target] & ~target_bit
+                targets ^= target_bit
+    return between
+
+
+KNIGHT_ATTACKS = _buildLeaperTable(KNIGHT_OFFSETS)
+KING_ATTACKS = _buildLeaperTable(DIRECTIONS)
+PAWN_ATTACKS = {'w': _buildLeaperTable(((-1, -1), (-1, 1))), 'b': _buildLeaperTable(((1, -1), (1, 1)))}
+RAYS = [_buildRayTable(direction) for direction in DIRECTIONS]
+ROOK_RAYS = tuple((RAYS[i], POSITIVE_DIRECTIONS[i]) for i in range(4))
+BISHOP_RAYS = tuple((RAYS[i], POSITIVE_DIRECTIONS[i]) for i in range(4, 8))
+BETWEEN = _buildBetweenTable()  # squares strictly between two squares on a common line
+
+
+def slidingAttacks(square, occupied, rays):
+    """
+    Squares attacked from square along the given rays, stopping at (and including) the first occupied square.
+    """
+    attacks = 0
+    for ray_table, positive in rays:
+        ray = ray_table[square]
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= ray_table[blocker]
+        attacks |= ray
+    return attacks
+
+
+class BitboardGameState(GameState):
+    """
+    Same contract as GameState, but every piece type is also kept as a 64-bit set and move generation works on those.
+    The board is a plain list of lists so Move and the GUI can still read board[row][col].
+    """
+
+    def __init__(self, is_black):
+        super().__init__(is_black)
+        self.board = self.board.tolist()
+        self.rebuildBitboards()
+
+    def rebuildBitboards(self):
+        bitboards = dict.fromkeys(PIECES, 0)
+        square_bit = 1
+        for row in self.board:
+            for piece in row:
+                if piece != '--':
+                    bitboards[piece] |= square_bit
+                square_bit <<= 1
+        self.bitboards = bitboards
+        self.occupancy = {color: bitboards[pawn] | bitboards[knight] | bitboards[bishop] | bitboards[rook] |
+                          bitboards[queen] | bitboards[king]
+                          for color, (pawn, knight, bishop, rook, queen, king) in PIECE_NAMES.items()}
+
+    def loadFen(self, fen):
+        super().loadFen(fen)
+        self.rebuildBitboards()
+
+    def makeMove(self, move):
+        super().makeMove(move)
+        self.toggleMove(move)
+
+    def undoMove(self):
+        if len(self.move_log) != 0:
+            last_move = self.move_log[-1]
+            super().undoMove()
+            self.toggleMove(last_move)
+
+    '''
+    Flip the bits a move changes, applying the same move twice restores the bitboards
+    '''
+
+    def toggleMove(self, move):
+        bitboards = self.bitboards
+        color = move.pieceMoved[0]
+        start = 1 << (move.startRow * 8 + move.startCol)
+        end = 1 << (move.endRow * 8 + move.endCol)
+        bitboards[move.pieceMoved] ^= start
+        bitboards[color + 'Q' if move.isPawnPromotion else move.pieceMoved] ^= end
+        self.occupancy[color] ^= start | end
+        if move.isEnPassantMove:
+            captured = 1 << (move.startRow * 8 + move.endCol)
+        elif move.pieceCaptured != '--':
+            captured = end
+        else:
+            captured = 0
+        if captured:
+            bitboards[move.pieceCaptured] ^= captured
+            self.occupancy[move.pieceCaptured[0]] ^= captured
+        if move.isCastleMove:
+            if move.endCol - move.startCol == 2:  # king side move
+                rook = (end << 1) | (end >> 1)
+            else:  # queen side move
+                rook = (end >> 2) | (end << 1)
+            bitboards[color + 'R'] ^= rook
+            self.occupancy[color] ^= rook
+
+    def getValidMoves(self):
+        """
+        All moves considering checks, generated from the bitboards.
+        """
+        moves = self.generateMoves(legal=True)
+        if len(moves) == 0:
+            if self.in_check:
+                self.checkMate = True
+            else:
+                self.staleMate = True
+        else:
+            self.checkMate = False
+            self.staleMate = False
+        return moves
+
+    def getAllPossibleMoves(self):
+        return self.generateMoves(legal=False)
+
+    def getCaptureMoves(self):
+        return self.generateMoves(legal=True, captures_only=True)
+
+    '''
+    Whether the side to move has any legal move, tested on target bitboards without building Move objects
+    '''
+
+    def hasLegalMove(self):
+        bitboards = self.bitboards
+        if self.WhiteToMove:
+            ally, enemy, forward, start_row = 'w', 'b', -8, 6
+        else:
+            ally, enemy, forward, start_row = 'b', 'w', 8, 1
+        pawn, knight, bishop, rook, queen, king = PIECE_NAMES[ally]
+        own = self.occupancy[ally]
+        opponent = self.occupancy[enemy]
+        occupied = own | opponent
+        king_bit = bitboards[king]
+        king_square = king_bit.bit_length() - 1
+        checkers = self.attackersTo(king_square, occupied, ally, enemy)
+        self.in_check = checkers != 0
+        if KING_ATTACKS[king_square] & ~own & ~self.attackedSquares(enemy, occupied ^ king_bit):
+            return True
+        if checkers & (checkers - 1):  # double check and the king can not move
+            return False
+        targets_mask = FULL_BOARD ^ own
+        if checkers:
+            targets_mask &= checkers | BETWEEN[king_square][checkers.bit_length() - 1]
+        pins = self.pinMasks(king_square, ally, enemy)
+
+        pieces = bitboards[knight]
+        while pieces:
+            square_bit = pieces & -pieces
+            pieces ^= square_bit
+            square = square_bit.bit_length() - 1
+            if square not in pins and KNIGHT_ATTACKS[square] & targets_mask:
+                return True
+        for rays, pieces in ((ROOK_RAYS, bitboards[rook] | bitboards[queen]),
+                             (BISHOP_RAYS, bitboards[bishop] | bitboards[queen])):
+            while pieces:
+                square_bit = pieces & -pieces
+                pieces ^= square_bit
+                square = square_bit.bit_length() - 1
+                if slidingAttacks(square, occupied, rays) & targets_mask & pins.get(square, FULL_BOARD):
+                    return True
+        pieces = bitboards[pawn]
+        while pieces:
+            square_bit = pieces & -pieces
+            pieces ^= square_bit
+            square = square_bit.bit_length() - 1
+            allowed = targets_mask & pins.get(square, FULL_BOARD)
+            one_step = square + forward
+            if not occupied & (1 << one_step):
+                if allowed & (1 << one_step):
+                    return True
+                if square >> 3 == start_row and allowed & ~occupied & (1 << (one_step + forward)):
+                    return True
+            if PAWN_ATTACKS[ally][square] & opponent & allowed:
+                return True
+        # en passant is the only move left, rare enough to leave to the full generator
+        return self.enpassantSquare != NO_SQUARE and len(self.generateMoves(legal=True, captures_only=True)) > 0
+
+    def hasNonPawnMaterial(self):
+        knight, bishop, rook, queen = PIECE_NAMES['w' if self.WhiteToMove else 'b'][1:5]
+        return (self.bitboards[knight] | self.bitboards[bishop] | self.bitboards[rook] | self.bitboards[queen]) != 0
+
+    def inCheck(self):
+        ally, enemy = ('w', 'b') if self.WhiteToMove else ('b', 'w')
+        king = self.bitboards[ally + 'K']
+        return self.attackersTo(king.bit_length() - 1, self.occupancy['w'] | self.occupancy['b'], ally, enemy) != 0
+
+    def squareUnderAttack(self, r, c):
+        ally, enemy = ('w', 'b') if self.WhiteToMove else ('b', 'w')
+        return self.attackersTo(r * 8 + c, self.occupancy['w'] | self.occupancy['b'], ally, enemy) != 0
+
+    '''
+    Bitboard of enemy pieces attacking square, pawns are looked up from the ally side
+    '''
+
+    def attackersTo(self, square, occupied, ally, enemy):
+        pawn, knight, bishop, rook, queen, king = (self.bitboards[name] for name in PIECE_NAMES[enemy])
+        return ((KNIGHT_ATTACKS[square] & knight) | (PAWN_ATTACKS[ally][square] & pawn) |
+                (KING_ATTACKS[square] & king) |
+                (slidingAttacks(square, occupied, ROOK_RAYS) & (rook | queen)) |
+                (slidingAttacks(square, occupied, BISHOP_RAYS) & (bishop | queen)))
+
+    '''
+    Every square attacked by color given the occupancy
+    '''
+
+    def attackedSquares(self, color, occupied):
+        pawn, knight, bishop, rook, queen, king = (self.bitboards[name] for name in PIECE_NAMES[color])
+        if color == 'w':
+            attacks = ((pawn & NOT_A_FILE) >> 9) | ((pawn & NOT_H_FILE) >> 7)
+        else:
+            attacks = (((pawn & NOT_A_FILE) << 7) | ((pawn & NOT_H_FILE) << 9)) & FULL_BOARD
+        attacks |= KING_ATTACKS[king.bit_length() - 1]
+        while knight:
+            square_bit = knight & -knight
+            attacks |= KNIGHT_ATTACKS[square_bit.bit_length() - 1]
+            knight ^= square_bit
+        sliders = rook | queen
+        while sliders:
+            square_bit = sliders & -sliders
+            attacks |= slidingAttacks(square_bit.bit_length() - 1, occupied, ROOK_RAYS)
+            sliders ^= square_bit
+        sliders = bishop | queen
+        while sliders:
+            square_bit = sliders & -sliders
+            attacks |= slidingAttacks(square_bit.bit_length() - 1, occupied, BISHOP_RAYS)
+            sliders ^= square_bit
+        return attacks
+
+    '''
+    Map each pinned ally piece to the squares it may still move to: the line between king and pinning piece
+    '''
+
+    def pinMasks(self, king_square, ally, enemy):
+        pins = {}
+        occupied = self.occupancy['w'] | self.occupancy['b']
+        own = self.occupancy[ally]
+        _, _, bishop, rook, queen, _ = (self.bitboards[name] for name in PIECE_NAMES[enemy])
+        for i in range(8):
+            sliders = (rook | queen) if i < 4 else (bishop | queen)
+            ray_table = RAYS[i]
+            ray = ray_table[king_square]
+            if not ray & sliders:
+                continue
+            blockers = ray & occupied
+            if POSITIVE_DIRECTIONS[i]:
+                first = blockers & -blockers
+                rest = blockers ^ first
+                second = rest & -rest
+            else:
+                first = 1 << (blockers.bit_length() - 1)
+                rest = blockers ^ first
+                second = 1 << (rest.bit_length() - 1) if rest else 0
+            if first & own and second & sliders:
+                pins[first.bit_length() - 1] = ray ^ ray_table[second.bit_length() - 1]
+        return pins
+
+    '''
+    Generate moves from the bitboards, legal=False skips pins, checks and castling
+    and captures_only keeps just captures and promotions
+    '''
+
+    def generateMoves(self, legal=True, captures_only=False):
+        moves = []
+        board = self.board
+        bitboards = self.bitboards
+        if self.WhiteToMove:
+            ally, enemy, forward, start_row, promotion_row = 'w', 'b', -8, 6, 0
+        else:
+            ally, enemy, forward, start_row, promotion_row = 'b', 'w', 8, 1, 7
+        pawn, knight, bishop, rook, queen, king = PIECE_NAMES[ally]
+        own = self.occupancy[ally]
+        opponent = self.occupancy[enemy]
+        occupied = own | opponent
+        targets_mask = opponent if captures_only else FULL_BOARD ^ own
+        king_bit = bitboards[king]
+        king_square = king_bit.bit_length() - 1
+        from_squares = Move.fromSquares
+
+        if legal:
+            checkers = self.attackersTo(king_square, occupied, ally, enemy)
+            self.in_check = checkers != 0
+            pins = self.pinMasks(king_square, ally, enemy)
+            attacked = self.attackedSquares(enemy, occupied ^ king_bit)
+            targets = KING_ATTACKS[king_square] & targets_mask & ~attacked
+        else:
+            checkers = 0
+            pins = {}
+            attacked = 0
+            targets = KING_ATTACKS[king_square] & targets_mask
+        while targets:
+            target_bit = targets & -targets
+            moves.append(from_squares(king_square, target_bit.bit_length() - 1, board))
+            targets ^= target_bit
+        if checkers & (checkers - 1):  # double check, king has to move
+            return moves
+        if checkers:  # capture the checking piece or block the line to the king
+            check_mask = checkers | BETWEEN[king_square][checkers.bit_length() - 1]
+        else:
+            check_mask = FULL_BOARD
+        targets_mask &= check_mask
+
+        pieces = bitboards[knight]
+        while pieces:
+            square_bit = pieces & -pieces
+            pieces ^= square_bit
+            square = square_bit.bit_length() - 1
+            if square in pins:  # a pinned knight can never stay on the pin line
+                continue
+            targets = KNIGHT_ATTACKS[square] & targets_mask
+            while targets:
+                target_bit = targets & -targets
+                moves.append(from_squares(square, target_bit.bit_length() - 1, board))
+                targets ^= target_bit
+
+        for rays, pieces in ((ROOK_RAYS, bitboards[rook] | bitboards[queen]),
+                             (BISHOP_RAYS, bitboards[bishop] | bitboards[queen])):
+            while pieces:
+                square_bit = pieces & -pieces
+                pieces ^= square_bit
+                square = square_bit.bit_length() - 1
+                targets = slidingAttacks(square, occupied, rays) & targets_mask & pins.get(square, FULL_BOARD)
+                while targets:
+                    target_bit = targets & -targets
+                    moves.append(from_squares(square, target_bit.bit_length() - 1, board))
+                    targets ^= target_bit
+
+        pieces = bitboards[pawn]
+        enpassant_bit = 0
+        if self.enpassantSquare != NO_SQUARE:
+            enpassant_bit = 1 << self.enpassantSquare
+        while pieces:
+            square_bit = pieces & -pieces
+            pieces ^= square_bit
+            square = square_bit.bit_length() - 1
+            allowed = check_mask & pins.get(square, FULL_BOARD)
+            one_step = square + forward
+            if not occupied & (1 << one_step) and (not captures_only or one_step >> 3 == promotion_row):
+                if allowed & (1 << one_step):
+                    moves.append(from_squares(square, one_step, board))
+                if square >> 3 == start_row and not captures_only and not occupied & (1 << (one_step + forward)) and \
+                        allowed & (1 << (one_step + forward)):
+                    moves.append(from_squares(square, one_step + forward, board))
+            targets = PAWN_ATTACKS[ally][square] & opponent & allowed
+            while targets:
+                target_bit = targets & -targets
+                moves.append(from_squares(square, target_bit.bit_length() - 1, board))
+                targets ^= target_bit
+            if PAWN_ATTACKS[ally][square] & enpassant_bit:
+                captured_bit = enpassant_bit << 8 if ally == 'w' else enpassant_bit >> 8
+                if legal:
+                    if checkers and not (check_mask & enpassant_bit or checkers == captured_bit):
+                        continue
+                    # both pawns leave the rank at once, so test the king against sliders directly
+                    after = occupied ^ square_bit ^ captured_bit ^ enpassant_bit
+                    _, _, enemy_bishop, enemy_rook, enemy_queen, _ = (bitboards[name] for name in PIECE_NAMES[enemy])
+                    if slidingAttacks(king_square, after, ROOK_RAYS) & (enemy_rook | enemy_queen) or \
+                            slidingAttacks(king_square, after, BISHOP_RAYS) & (enemy_bishop | enemy_queen):
+                        continue
+                moves.append(from_squares(square, enpassant_bit.bit_length() - 1, board, EN_PASSANT_FLAG))
+
+        if legal and not checkers and not captures_only:
+            self.getCastleMovesFromAttacks(king_square >> 3, king_square & 7, occupied, attacked, moves)
+        return moves
+
+    def getCastleMovesFromAttacks(self, row, col, occupied, attacked, moves):
+        if self.WhiteToMove:
+            king_side, queen_side, rooks = self.castleRights & WHITE_KING_SIDE, self.castleRights & WHITE_QUEEN_SIDE, \
+                                           self.bitboards['wR']
+        else:
+            king_side, queen_side, rooks = self.castleRights & BLACK_KING_SIDE, self.castleRights & BLACK_QUEEN_SIDE, \
+                                           self.bitboards['bR']
+        row_shift = row * 8
+        if king_side and rooks & (1 << (row_shift + 7)):
+            path = (1 << (row_shift + 5)) | (1 << (row_shift + 6))
+            if not occupied & path and not attacked & path:
+                moves.append(Move((row, col), (row, col + 2), self.board, castle_move=True))
+        if queen_side and rooks & (1 << row_shift):
+            path = (1 << (row_shift + 2)) | (1 << (row_shift + 3))
+            if not occupied & (path | (1 << (row_shift + 1))) and not attacked & path:
+                moves.append(Move((row, col), (row, col - 2), self.board, castle_move=True))
+
+
+'''
+Backend switch
+'''
+
+BACKENDS = {'numpy': GameState, 'bitboard': BitboardGameState}
+DEFAULT_BACKEND = 'bitboard'
+
+
+def createGameState(backend=DEFAULT_BACKEND, is_black=True, fen=None):
+    game_state = BACKENDS[backend](is_black)
+    if fen is not None:
+        game_state.loadFen(fen)
+    return game_state
+
+
+def crossCheckBackends(depth, first='numpy', second='bitboard'):
+    """
+    Walk every line up to depth with two backends in lock step and raise AssertionError at the first position where
+    their boards or legal moves differ. Returns the number of positions compared.
+    """
+    return _crossCheck(createGameState(first), createGameState(second), depth, [])
+
+
+def _crossCheck(first, second, depth, line):
+    first_moves = first.getValidMoves()
+    second_moves = second.getValidMoves()
+    first_rows = [[str(piece) for piece in row] for row in first.board]
+    second_rows = [[str(piece) for piece in row] for row in second.board]
+    if first_rows != second_rows:
+        raise AssertionError('boards differ after ' + ' '.join(line))
+    if sorted(move.moveID for move in first_moves) != sorted(move.moveID for move in second_moves):
+        raise AssertionError('moves differ after %s: %s / %s' % (' '.join(line),
+                                                                  sorted(m.getChessNotation() for m in first_moves),
+                                                                  sorted(m.getChessNotation() for m in second_moves)))
+    if (first.checkMate, first.staleMate) != (second.checkMate, second.staleMate):
+        raise AssertionError('game over flags differ after ' + ' '.join(line))
+    compared = 1
+    if depth > 0:
+        for move in first_moves:
+            partner = second_moves[second_moves.index(move)]
+            first.makeMove(move)
+            second.makeMove(partner)
+            line.append(move.getChessNotation())
+            compared += _crossCheck(first, second, depth - 1, line)
+            line.pop()
+            first.undoMove()
+            second.undoMove()
+    return compared
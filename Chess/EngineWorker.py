@@ -0,0 +1,135 @@
+"""
+Long-lived search process.
+The worker keeps its own GameState and the AI module state (transposition table, history) alive between moves, so an AI
+turn only sends the moves played since the last search instead of starting a process and pickling the whole game.
+A running search is cancelled through a shared counter rather than by terminating the process.
+If the worker fails it sends the traceback back and exits, and pollBestMove raises EngineError.
+"""
+import traceback
+from multiprocessing import Process, Queue, RawValue
+from queue import Empty
+
+from ChessEngine import DEFAULT_BACKEND, createGameState
+
+FAILED = -1  # search id of the result that carries the traceback of a failed worker
+
+
+class EngineError(Exception):
+    pass
+
+
+class EngineWorker:
+    def __init__(self, backend=DEFAULT_BACKEND):
+        self.backend = backend
+        self.commands = Queue()
+        self.results = Queue()
+        self.cancelled_id = RawValue('i', 0)  # searches with an id up to this value stop as soon as they see it
+        self.search_id = 0
+        self.synced_moves = []  # notation of the moves the worker has on its board
+        self.synced_root = None  # hash of the position those moves start from
+        self.synced_offset = 0  # moves already played in the position the worker was last given
+        self.process = Process(target=workerLoop, args=(self.commands, self.results, self.cancelled_id, backend),
+                               daemon=True)
+        self.process.start()
+
+    '''
+    Bring the worker position in line with game_state by sending only what changed since the last sync
+    '''
+
+    def syncPosition(self, game_state):
+        moves = [move.getChessNotation() for move in game_state.move_log]
+        common = 0
+        while common < min(len(moves), len(self.synced_moves)) and moves[common] == self.synced_moves[common]:
+            common += 1
+        if game_state.hashLog[0] != self.synced_root or common < self.synced_offset:
+            # different game, or the worker would have to undo past the position it was given
+            self.commands.put(('position', (game_state.getFen(), [])))
+            self.synced_root = game_state.hashLog[0]
+            self.synced_moves = moves
+            self.synced_offset = len(moves)
+            return
+        if common < len(self.synced_moves):
+            self.commands.put(('undo', len(self.synced_moves) - common))
+        if common < len(moves):
+            self.commands.put(('moves', moves[common:]))
+        self.synced_moves = moves
+
+    def startSearch(self, game_state, **limits):
+        """
+        Search the position of game_state with findBestMove limits (move_time, time_left, increment, max_depth).
+        Returns the search id, pollBestMove reports the result.
+        """
+        self.cancel()
+        self.syncPosition(game_state)
+        self.search_id += 1
+        self.commands.put(('go', (self.search_id, limits)))
+        return self.search_id
+
+    def cancel(self):
+        self.cancelled_id.value = self.search_id
+
+    def pollBestMove(self):
+        """
+        Notation of the best move of the current search, or None while it is still running.
+        Results of cancelled searches are dropped. Raises EngineError once the worker has failed or exited.
+        """
+        while True:
+            try:
+                search_id, notation = self.results.get_nowait()
+            except Empty:
+                if not self.process.is_alive():
+                    raise EngineError('search process exited with code %s' % self.process.exitcode)
+                return None
+            if search_id == FAILED:
+                raise EngineError('search process failed:\n%s' % notation)
+            if search_id == self.search_id:
+                return notation
+
+    def close(self):
+        self.cancel()
+        self.commands.put(('quit', None))
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+def applyMoves(game_state, notations):
+    for notation in notations:
+        for move in game_state.getValidMoves():
+            if move.getChessNotation() == notation:
+                game_state.makeMove(move)
+                break
+        else:
+            raise ValueError('illegal move %s in position %s' % (notation, game_state.getFen()))
+
+
+def workerLoop(commands, results, cancelled_id, backend):
+    try:
+        runCommands(commands, results, cancelled_id, backend)
+    except Exception:
+        results.put((FAILED, traceback.format_exc()))
+
+
+def runCommands(commands, results, cancelled_id, backend):
+    import AI  # imported here so the search tables live in the worker process only
+    game_state = createGameState(backend)
+    while True:
+        command, argument = commands.get()
+        if command == 'quit':
+            break
+        elif command == 'position':
+            fen, notations = argument
+            game_state = createGameState(backend, fen=fen)
+            applyMoves(game_state, notations)
+        elif command == 'moves':
+            applyMoves(game_state, argument)
+        elif command == 'undo':
+            for _ in range(argument):
+                game_state.undoMove()
+        elif command == 'go':
+            search_id, limits = argument
+            if cancelled_id.value >= search_id:
+                continue
+            best_move, _ = AI.findBestMove(game_state, game_state.getValidMoves(),
+                                           should_stop=lambda: cancelled_id.value >= search_id, log=print, **limits)
+            results.put((search_id, best_move.getChessNotation() if best_move is not None else None))
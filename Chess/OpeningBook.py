@@ -0,0 +1,133 @@
+"""
+Opening book stored as a sorted binary file that is memory-mapped and binary-searched, so even a book with millions of
+entries opens instantly and is never loaded into Python objects.
+The layout follows Polyglot: 16-byte big-endian entries of key (8 bytes), move (2), weight (2) and learn (4), sorted by
+key. The key is our own Zobrist hash and the move is Move.code, since Polyglot's random numbers and move encoding are
+not part of this engine, so Polyglot books can not be read.
+
+    python OpeningBook.py build book_lines.txt book.bin    # one line of moves from the start position per line
+    python OpeningBook.py probe book.bin e2e4 e7e5          # book moves after the given moves
+"""
+import mmap
+import random
+import struct
+import sys
+
+from ChessEngine import createGameState
+
+ENTRY = struct.Struct('>QHHI')
+KEY = struct.Struct('>Q')
+MAX_WEIGHT = 0xFFFF
+
+
+class OpeningBook:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # mmap refuses empty files
+            self.data = b''
+        self.size = len(self.data) // ENTRY.size
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    '''
+    Index of the first entry whose key is not below key
+    '''
+
+    def lowerBound(self, key):
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if KEY.unpack_from(self.data, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def entries(self, key):
+        """
+        (move code, weight) of every book entry for the position with Zobrist hash key.
+        """
+        found = []
+        for index in range(self.lowerBound(key), self.size):
+            entry_key, code, weight, _ = ENTRY.unpack_from(self.data, index * ENTRY.size)
+            if entry_key != key:
+                break
+            found.append((code, weight))
+        return found
+
+    def pickMove(self, game_state, valid_moves, rng=random):
+        """
+        A book move for game_state chosen at random in proportion to its weight, or None when the position is not in
+        the book. Entries that are not among valid_moves (hash collisions) are ignored.
+        """
+        moves_by_code = {move.code: move for move in valid_moves}
+        candidates = [(moves_by_code[code], weight) for code, weight in self.entries(game_state.zobristHash)
+                      if code in moves_by_code and weight > 0]
+        if not candidates:
+            return None
+        pick = rng.randrange(sum(weight for _, weight in candidates))
+        for move, weight in candidates:
+            if pick < weight:
+                return move
+            pick -= weight
+
+
+def playLine(game_state, notations):
+    """
+    Yield (hash, move) for every move of a line of coordinate moves, playing them on game_state.
+    """
+    for notation in notations:
+        move = next((move for move in game_state.getValidMoves() if move.getChessNotation() == notation[:4]), None)
+        if move is None:
+            raise ValueError('illegal move %s in position %s' % (notation, game_state.getFen()))
+        yield game_state.zobristHash, move
+        game_state.makeMove(move)
+
+
+def writeBook(path, lines):
+    """
+    Write a book from lines of coordinate moves played from the start position. The weight of a move is the number
+    of lines that play it in that position.
+    """
+    weights = {}
+    game_state = createGameState()
+    for line in lines:
+        for key, move in playLine(game_state, line):
+            weights[key, move.code] = weights.get((key, move.code), 0) + 1
+        while game_state.move_log:
+            game_state.undoMove()
+    with open(path, 'wb') as book_file:
+        for (key, code), weight in sorted(weights.items(), key=lambda item: (item[0][0], -item[1])):
+            book_file.write(ENTRY.pack(key, code, min(weight, MAX_WEIGHT), 0))
+    return len(weights)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 3 and argv[0] == 'build':
+        with open(argv[1]) as lines_file:
+            lines = [line.split() for line in lines_file if line.strip() and not line.startswith('#')]
+        print('%d entries written to %s' % (writeBook(argv[2], lines), argv[2]))
+    elif len(argv) >= 2 and argv[0] == 'probe':
+        book = OpeningBook(argv[1])
+        game_state = createGameState()
+        for _ in playLine(game_state, argv[2:]):
+            pass
+        moves_by_code = {move.code: move for move in game_state.getValidMoves()}
+        for code, weight in book.entries(game_state.zobristHash):
+            print(moves_by_code[code].getChessNotation() if code in moves_by_code else '?', weight)
+        book.close()
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Root splitting search over a process pool.
+The root moves are dealt round-robin to the workers, and every worker runs the normal iterative deepening search of
+AI.findBestMove on its share. Each worker process keeps its own transposition table and history between searches.
+Scores of a completed depth are exact at the root, so the results of all workers are compared at the deepest depth
+every worker finished. With one worker the search runs in the calling process like AI.findBestMove. Root moves are
+never shuffled, so a single worker search is reproducible.
+
+Root splitting is not free: a worker never sees the alpha bound the others have found, so together they search more
+nodes than a single search does, 1.5 to 2 times as many with two workers. It only pays off with a worker per core
+and enough work per position to hide the process overhead. At shallow depths, or with more workers than cores, it
+costs more than it gains and the benchmark shows a speedup below 1.
+
+    python ParallelSearch.py                       # time to depth 5 for 1..cpu count workers
+    python ParallelSearch.py --workers 1 2 4 --depth 5
+"""
+import argparse
+import os
+import sys
+import time
+from multiprocessing import Pool, RawValue
+
+import AI
+from ChessEngine import BACKENDS, DEFAULT_BACKEND, STARTING_FEN, createGameState
+from SearchStatistics import SearchStatistics, combine
+
+DEFAULT_WORKERS = 1
+DEFAULT_BENCHMARK_DEPTH = 5  # at depth 3 and 4 the process overhead outweighs the split work
+POLL_INTERVAL = 0.005  # seconds between checks of should_stop while the workers search
+
+BENCHMARK_POSITIONS = [
+    STARTING_FEN,
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+]
+
+worker_stop = None  # shared stop flag, set in every pool process by initWorker
+
+
+class ParallelSearch:
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = max(1, workers)
+        self.stop_flag = RawValue('b', 0)
+        self.pool = Pool(self.workers, initializer=initWorker, initargs=(self.stop_flag,)) if self.workers > 1 else None
+        self.nodes = 0  # nodes searched by all workers in the last search
+        self.statistics = SearchStatistics()  # of the last search, summed over the workers
+        self.new_game = False  # the workers clear their tables before the next search
+
+    def findBestMove(self, game_state, valid_moves, return_queue=None, max_depth=None, move_time=None,
+                     time_left=None, increment=0, should_stop=None, depth_callback=None, statistics=None,
+                     profile=False, log=None):
+        """
+        Same arguments and result as AI.findBestMove. depth_callback is called once per depth every worker completed,
+        after the search has finished, with nodes set to what all workers needed to get there. The statistics returned
+        and kept in self.statistics are those of all workers added up.
+        """
+        book_move = AI.bookMove(game_state, valid_moves) if self.pool is not None else None
+        if book_move is not None:
+            best_move = book_move
+            self.nodes = 0
+            if statistics is None:
+                statistics = SearchStatistics()
+            else:
+                statistics.__init__()
+            self.statistics = statistics
+            if log is not None:
+                log('book move %s' % book_move.getChessNotation())
+        elif self.pool is None or len(valid_moves) < 2:
+            shuffle = AI.SHUFFLE_ROOT_MOVES
+            AI.SHUFFLE_ROOT_MOVES = False
+            try:
+                best_move, self.statistics = AI.findBestMove(
+                    game_state, valid_moves, max_depth=max_depth, move_time=move_time, time_left=time_left,
+                    increment=increment, should_stop=should_stop, depth_callback=depth_callback, statistics=statistics,
+                    profile=profile, log=log)
+            finally:
+                AI.SHUFFLE_ROOT_MOVES = shuffle
+            self.nodes = self.statistics.nodes
+        else:
+            best_move = self.splitRoot(game_state, valid_moves, should_stop, depth_callback, statistics, log,
+                                       {'max_depth': max_depth, 'move_time': move_time, 'time_left': time_left,
+                                        'increment': increment, 'profile': profile})
+        if return_queue is not None:
+            return_queue.put(best_move)
+        return best_move, self.statistics
+
+    def splitRoot(self, game_state, valid_moves, should_stop, depth_callback, statistics, log, limits):
+        self.stop_flag.value = 0
+        shares = [valid_moves[i::self.workers] for i in range(self.workers)]
+        tasks = [self.pool.apply_async(searchRootMoves,
+                                       (game_state, [move.getChessNotation() for move in share], limits,
+                                        self.new_game))
+                 for share in shares if share]
+        self.new_game = False
+        while not all(task.ready() for task in tasks):
+            if should_stop is not None and should_stop():
+                self.stop()
+            time.sleep(POLL_INTERVAL)
+        results = [task.get() for task in tasks]
+        self.statistics = combine([result[2] for result in results], statistics)
+
+        moves_by_notation = {move.getChessNotation(): move for move in valid_moves}
+        common_depth = min(len(depths) for _, depths, _ in results)
+        if common_depth == 0:  # stopped before some worker finished depth 1
+            self.nodes = self.statistics.nodes
+            if log is not None:
+                log(str(self.statistics))
+            return moves_by_notation[results[0][0]]
+        best_score = -AI.INFINITY
+        best_move = None
+        for depth in range(1, common_depth + 1):
+            best_score, best_notation, _ = max((depths[depth - 1] for _, depths, _ in results), key=lambda r: r[0])
+            best_move = moves_by_notation[best_notation]
+            self.nodes = sum(depths[depth - 1][2] for _, depths, _ in results)
+            if log is not None:
+                log('depth %d score %s nodes %d' % (depth, best_score, self.nodes))
+            if depth_callback is not None:
+                depth_callback(depth, best_score, best_move)
+        self.nodes = self.statistics.nodes
+        if log is not None:
+            log(str(self.statistics))
+        return best_move
+
+    '''
+    Forget the tables of earlier searches, in this process now and in the workers at their next search
+    '''
+
+    def newGame(self):
+        AI.newGame()
+        self.new_game = self.pool is not None
+
+    def stop(self):
+        self.stop_flag.value = 1
+
+    def close(self):
+        if self.pool is not None:
+            self.stop()
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+
+def initWorker(stop_flag):
+    global worker_stop
+    worker_stop = stop_flag
+    AI.USE_BOOK = False  # the parent already looked in the book, a worker only sees part of the root moves
+    AI.SHUFFLE_ROOT_MOVES = False
+
+
+def searchRootMoves(game_state, notations, limits, new_game=False):
+    """
+    Search only the given root moves, after clearing the tables of this worker if new_game is set. Returns the
+    notation of the best move, a (score, notation, nodes so far) tuple for every completed depth and the statistics
+    of the search.
+    """
+    if new_game:
+        AI.newGame()
+    root_moves = [move for move in game_state.getValidMoves() if move.getChessNotation() in notations]
+    depths = []
+
+    statistics = SearchStatistics()
+
+    def recordDepth(depth, score, move):
+        depths.append((score, move.getChessNotation(), statistics.nodes))
+
+    best_move, _ = AI.findBestMove(game_state, root_moves, should_stop=lambda: worker_stop.value,
+                                   depth_callback=recordDepth, statistics=statistics, **limits)
+    return best_move.getChessNotation(), depths, statistics
+
+
+def benchmark(worker_counts, depth, backend=DEFAULT_BACKEND, out=sys.stdout):
+    """
+    Time a fixed depth search of the benchmark positions for every worker count, and print the speedup over the
+    first count and how many more nodes the split search needed. Returns {workers: seconds}.
+    """
+    cpus = os.cpu_count() or 1
+    print('%d cpus' % cpus, file=out)
+    times = {}
+    use_book = AI.USE_BOOK
+    AI.USE_BOOK = False  # a book move would end the search of the start position before it began
+    try:
+        for workers in worker_counts:
+            times[workers] = benchmarkWorkers(workers, depth, backend)
+            total_nodes, total_time = times[workers]
+            print('workers %2d depth %d nodes %9d (x%.2f) time %8.3fs nps %8d speedup %.2f%s' %
+                  (workers, depth, total_nodes, total_nodes / times[worker_counts[0]][0],
+                   total_time, total_nodes / total_time if total_time else 0,
+                   times[worker_counts[0]][1] / total_time if total_time else 0,
+                   ' (more workers than cpus)' if workers > cpus else ''), file=out)
+    finally:
+        AI.USE_BOOK = use_book
+    return {workers: seconds for workers, (_, seconds) in times.items()}
+
+
+def benchmarkWorkers(workers, depth, backend):
+    """
+    Total (nodes, seconds) of the benchmark positions with this many workers, every position searched from empty
+    tables.
+    """
+    search = ParallelSearch(workers)
+    total_time = 0.0
+    total_nodes = 0
+    try:
+        for fen in BENCHMARK_POSITIONS:
+            game_state = createGameState(backend, fen=fen)
+            search.newGame()
+            start = time.perf_counter()
+            search.findBestMove(game_state, game_state.getValidMoves(), max_depth=depth)
+            total_time += time.perf_counter() - start
+            total_nodes += search.nodes
+    finally:
+        search.close()
+    return total_nodes, total_time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Parallel search speedup versus worker count.')
+    parser.add_argument('--workers', type=int, nargs='+', default=list(range(1, (os.cpu_count() or 1) + 1)))
+    parser.add_argument('--depth', type=int, default=DEFAULT_BENCHMARK_DEPTH, help='search depth of every position')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=DEFAULT_BACKEND)
+    args = parser.parse_args(argv)
+    benchmark(args.workers, args.depth, args.backend)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
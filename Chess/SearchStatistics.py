@@ -0,0 +1,141 @@
+"""
+Statistics of one search, returned by AI.findBestMove together with the move.
+The node and cutoff counters are the ones the search keeps anyway, so collecting them costs nothing. Phase times are
+only measured when findBestMove is called with profile=True: the move generators of the searched game state and the
+evaluation are then wrapped in timers for the length of that search and unwrapped afterwards, so a search without
+profiling runs exactly the same code as before.
+"""
+import time
+
+PHASES = ('movegen', 'eval', 'search')
+GENERATOR_METHODS = ('getValidMoves', 'getCaptureMoves', 'hasLegalMove')
+
+
+class SearchStatistics:
+    def __init__(self):
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.depth = 0  # deepest completed iteration
+        self.depth_nodes = []  # nodes searched by every completed iteration
+        self.time = 0.0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.phase_times = None  # {phase: seconds} of a profiled search
+
+    @property
+    def nps(self):
+        return int(self.nodes / self.time) if self.time else 0
+
+    @property
+    def branching_factor(self):
+        """
+        Effective branching factor: nodes of the last completed iteration over nodes of the one before it.
+        """
+        if len(self.depth_nodes) < 2 or not self.depth_nodes[-2]:
+            return 0.0
+        return self.depth_nodes[-1] / self.depth_nodes[-2]
+
+    @property
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    @property
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    def asDict(self):
+        values = {'nodes': self.nodes, 'quiescence_nodes': self.quiescence_nodes, 'depth': self.depth,
+                  'time': self.time, 'nps': self.nps, 'branching_factor': self.branching_factor,
+                  'cutoffs': self.cutoffs, 'first_move_cutoff_rate': self.first_move_cutoff_rate,
+                  'tt_probes': self.tt_probes, 'tt_hit_rate': self.tt_hit_rate}
+        if self.phase_times is not None:
+            values.update(('%s_time' % phase, seconds) for phase, seconds in self.phase_times.items())
+        return values
+
+    def __str__(self):
+        text = 'completed depth %d nodes %d quiescence nodes %d time %.3f nps %d branching factor %.2f ' \
+               'first move cutoff rate %.3f tt hit rate %.3f' % (
+                   self.depth, self.nodes, self.quiescence_nodes, self.time, self.nps, self.branching_factor,
+                   self.first_move_cutoff_rate, self.tt_hit_rate)
+        if self.phase_times is not None:
+            text += ' ' + ' '.join('%s %.3f' % (phase, self.phase_times[phase]) for phase in PHASES)
+        return text
+
+
+def combine(statistics, total=None):
+    """
+    Statistics of searches that ran side by side, such as the workers of a parallel search: counters are added up,
+    depth is the deepest iteration all of them completed and time the longest of them. The result is written to total
+    if given, a new SearchStatistics otherwise.
+    """
+    if total is None:
+        total = SearchStatistics()
+    else:
+        total.__init__()
+    total.depth = min(len(item.depth_nodes) for item in statistics) if statistics else 0
+    total.depth_nodes = [sum(item.depth_nodes[i] for item in statistics) for i in range(total.depth)]
+    total.time = max((item.time for item in statistics), default=0.0)
+    for item in statistics:
+        total.nodes += item.nodes
+        total.quiescence_nodes += item.quiescence_nodes
+        total.cutoffs += item.cutoffs
+        total.first_move_cutoffs += item.first_move_cutoffs
+        total.tt_probes += item.tt_probes
+        total.tt_hits += item.tt_hits
+        if item.phase_times is not None:
+            if total.phase_times is None:
+                total.phase_times = dict.fromkeys(PHASES, 0.0)
+            for phase in PHASES:
+                total.phase_times[phase] += item.phase_times[phase]
+    return total
+
+
+class PhaseProfiler:
+    """
+    Times the move generation and evaluation of one search. start() wraps the generator methods of game_state (as
+    instance attributes, so other game states are untouched) and the evaluation function named in module; stop()
+    removes the wrappers again and returns {phase: seconds}, search being whatever time is left.
+    """
+
+    def __init__(self, game_state, module, evaluation='scoreBoard'):
+        self.game_state = game_state
+        self.module = module
+        self.evaluation = evaluation
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.active = None  # phase currently timed, nested calls are part of it
+        self.original_evaluation = None
+        self.start_time = 0.0
+
+    def timed(self, function, phase):
+        totals = self.totals
+        perf_counter = time.perf_counter
+
+        def wrapper(*args):
+            if self.active is not None:
+                return function(*args)
+            self.active = phase
+            start = perf_counter()
+            try:
+                return function(*args)
+            finally:
+                totals[phase] += perf_counter() - start
+                self.active = None
+
+        return wrapper
+
+    def start(self):
+        for name in GENERATOR_METHODS:
+            setattr(self.game_state, name, self.timed(getattr(self.game_state, name), 'movegen'))
+        self.original_evaluation = getattr(self.module, self.evaluation)
+        setattr(self.module, self.evaluation, self.timed(self.original_evaluation, 'eval'))
+        self.start_time = time.perf_counter()
+
+    def stop(self):
+        elapsed = time.perf_counter() - self.start_time
+        for name in GENERATOR_METHODS:
+            delattr(self.game_state, name)
+        setattr(self.module, self.evaluation, self.original_evaluation)
+        self.totals['search'] = max(0.0, elapsed - self.totals['movegen'] - self.totals['eval'])
+        return dict(self.totals)
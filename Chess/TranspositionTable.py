@@ -0,0 +1,105 @@
+"""
+Fixed size transposition table for the search.
+Entries live in preallocated parallel arrays, so the table never grows past its memory cap and storing an entry
+allocates nothing. Each bucket has two slots: a depth-preferred slot that keeps the deepest result of the current
+search, and an always-replace slot that takes whatever the first slot refused.
+"""
+from array import array
+
+EXACT = 0
+LOWER_BOUND = 1  # search failed high, real score is at least the stored one
+UPPER_BOUND = 2  # search failed low, real score is at most the stored one
+
+NO_MOVE = 0  # move id 0 would be a8a8, which is never a legal move
+EMPTY = -1
+
+# bytes per slot: key, score, move, depth, bound, generation
+ENTRY_SIZE = 8 + 8 + 2 + 1 + 1 + 1
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16):
+        self.size_mb = size_mb
+        self.bucket_count = max(1, size_mb * 1024 * 1024 // (2 * ENTRY_SIZE))
+        slots = 2 * self.bucket_count
+        self.keys = array('Q', bytes(8 * slots))
+        self.scores = array('d', bytes(8 * slots))
+        self.moves = array('H', bytes(2 * slots))
+        self.depths = array('b', [EMPTY]) * slots
+        self.bounds = array('B', bytes(slots))
+        self.generations = array('B', bytes(slots))
+        self.generation = 0
+        self.resetCounters()
+
+    def resetCounters(self):
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0  # misses where the bucket was full of other positions
+        self.stores = 0
+        self.overwrites = 0  # stores that evicted a different position
+
+    def clear(self):
+        slots = 2 * self.bucket_count
+        self.keys = array('Q', bytes(8 * slots))
+        self.depths = array('b', [EMPTY]) * slots
+        self.generation = 0
+        self.resetCounters()
+
+    '''
+    Start a new search, entries from older searches become the first to be replaced
+    '''
+
+    def newSearch(self):
+        self.generation = (self.generation + 1) & 0xFF
+
+    '''
+    Return (depth, score, bound, move id) stored for key, or None
+    '''
+
+    def probe(self, key):
+        slot = (key % self.bucket_count) << 1
+        keys = self.keys
+        if keys[slot] != key or self.depths[slot] == EMPTY:
+            slot += 1
+            if keys[slot] != key or self.depths[slot] == EMPTY:
+                self.misses += 1
+                if self.depths[slot] != EMPTY and self.depths[slot - 1] != EMPTY:
+                    self.collisions += 1
+                return None
+        self.hits += 1
+        return self.depths[slot], self.scores[slot], self.bounds[slot], self.moves[slot]
+
+    def store(self, key, depth, score, bound, move_id):
+        slot = (key % self.bucket_count) << 1
+        depths = self.depths
+        # the depth-preferred slot takes the entry if it is the same position, empty, stale or not deeper
+        if not (self.keys[slot] == key or depths[slot] == EMPTY or self.generations[slot] != self.generation or
+                depth >= depths[slot]):
+            slot += 1
+        if depths[slot] != EMPTY and self.keys[slot] != key:
+            self.overwrites += 1
+        elif self.keys[slot] == key and move_id == NO_MOVE:
+            move_id = self.moves[slot]  # keep the best move of an earlier search of this position
+        self.stores += 1
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.scores[slot] = score
+        self.bounds[slot] = bound
+        self.moves[slot] = move_id
+        self.generations[slot] = self.generation
+
+    '''
+    Permille of slots holding an entry, sampled from the first thousand like the UCI hashfull field
+    '''
+
+    def hashFull(self):
+        sample = min(1000, 2 * self.bucket_count)
+        used = sum(1 for slot in range(sample) if self.depths[slot] != EMPTY)
+        return used * 1000 // sample
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {'size_mb': self.size_mb, 'entries': 2 * self.bucket_count, 'probes': probes, 'hits': self.hits,
+                'misses': self.misses, 'collisions': self.collisions, 'stores': self.stores,
+                'overwrites': self.overwrites, 'hit_rate': self.hits / probes if probes else 0.0,
+                'hashfull': self.hashFull()}
@@ -0,0 +1,68 @@
+'''
+Bench: search a fixed set of positions to a fixed depth from a clean state and report the total node count, time
+and nps. Root moves are not shuffled, the opening book is off and the transposition table, killers and history are
+cleared before every position, so the node count is the same on every run and machine. It serves as a signature:
+a change that should not alter the search (a faster move generator, say) must leave it unchanged, and a change that
+alters the search shows up in it. nps is the speed figure to compare between builds.
+
+    python bench.py                         # default depth and backend
+    python bench.py --depth 5 --backend numpy
+'''
+import argparse
+import sys
+
+import AI
+from ChessEngine import BACKENDS, DEFAULT_BACKEND, STARTING_FEN, createGameState
+
+DEFAULT_BENCH_DEPTH = 4
+
+BENCH_POSITIONS = [
+    STARTING_FEN,
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+    'r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3',
+    'rnbq1rk1/ppp1bppp/4pn2/3p4/2PP4/2N2N2/PP2PPPP/R1BQKB1R w KQ - 4 6',
+    'r2q1rk1/pp2bppp/2n1pn2/3p4/3P4/2PBPN2/P4PPP/R1BQ1RK1 b - - 0 10',
+    '2r2rk1/1bqnbppp/p2ppn2/1p6/3NPP2/P1N1B3/1PPQB1PP/2R2R1K w - - 0 16',
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+    '8/8/4k3/3p4/3P4/4K3/8/8 w - - 0 1',
+    '6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1',
+]
+
+
+def bench(depth=DEFAULT_BENCH_DEPTH, backend=DEFAULT_BACKEND, positions=BENCH_POSITIONS, out=sys.stdout):
+    """
+    Search every position to depth and print a line per position and the totals. Returns (nodes, seconds).
+    """
+    shuffle, use_book = AI.SHUFFLE_ROOT_MOVES, AI.USE_BOOK
+    AI.SHUFFLE_ROOT_MOVES = AI.USE_BOOK = False
+    total_nodes = 0
+    total_time = 0.0
+    try:
+        for number, fen in enumerate(positions, 1):
+            AI.newGame()
+            game_state = createGameState(backend, fen=fen)
+            best_move, statistics = AI.findBestMove(game_state, game_state.getValidMoves(), max_depth=depth)
+            total_nodes += statistics.nodes
+            total_time += statistics.time
+            print('position %2d best %s nodes %8d time %7.3fs nps %7d' %
+                  (number, best_move.getChessNotation(), statistics.nodes, statistics.time, statistics.nps), file=out)
+    finally:
+        AI.SHUFFLE_ROOT_MOVES, AI.USE_BOOK = shuffle, use_book
+    print('bench depth %d backend %s nodes %d time %.3fs nps %d' %
+          (depth, backend, total_nodes, total_time, total_nodes / total_time if total_time else 0), file=out)
+    out.flush()
+    return total_nodes, total_time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Reproducible node count and speed of a fixed depth search.')
+    parser.add_argument('--depth', type=int, default=DEFAULT_BENCH_DEPTH)
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=DEFAULT_BACKEND)
+    args = parser.parse_args(argv)
+    bench(args.depth, args.backend)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
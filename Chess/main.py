@@ -2,12 +2,11 @@
 This is our main driver file. it will be responsible for handling user input and displaying current GameState
 '''
 import sys
-from multiprocessing import Queue, Process
 
 import pygame
 
-from AI import findBestMove
-from ChessEngine import GameState, Move
+from ChessEngine import createGameState, Move
+from EngineWorker import EngineError, EngineWorker
 
 pygame.init()
 WIDTH = HEIGHT = 512
@@ -16,6 +15,8 @@ MOVE_LOG_PANEL_HEIGHT = HEIGHT
 DIMENSION = 8
 SQUARE_SIZE = HEIGHT // DIMENSION
 FPS = 120
+AI_MOVE_TIME = 2.0  # seconds the AI may think per move
+MAX_ENGINE_FAILURES = 2  # search processes that may fail in a row before the AI gives up the game
 IMAGES = {}
 
 pygame.display.set_caption('Chess')
@@ -164,25 +165,30 @@ def draw_endgame_text(screen, text):
 
 
 def main(player1=True, player2=False):
-    gs = GameState(True)
+    gs = createGameState()
     load_images()
     run = True
     animate = False
     sqSelected = ()  # Keep track last click of player (tuple:(row,col))
     playerClicks = []  # Track of player click, element
     valid_moves = gs.getValidMoves()
+    draw_reason = None
     moveMade = False
     gameOver = False
     player1 = player1  # If a human playing white then this will be true vice_versa with Ai
     player2 = player2  # same as above but for black
     ai_thinking = False
     move_undone = False
-    move_finder_process = None
+    # one search process for the whole game, it keeps its tables between moves; none when two humans play
+    engine = EngineWorker() if not (player1 and player2) else None
+    engine_failures = 0  # in a row, the AI gives up the game after MAX_ENGINE_FAILURES
     while run:
         human_turn = (gs.WhiteToMove and player1) or (not gs.WhiteToMove and player2)
         clock.tick(FPS)
         for e in pygame.event.get():
             if e.type == pygame.QUIT:
+                if engine is not None:
+                    engine.close()
                 pygame.quit()
                 sys.exit()
             # key handler
@@ -193,22 +199,25 @@ def main(player1=True, player2=False):
                     animate = False
                     gameOver = False
                     if ai_thinking:
-                        move_finder_process.terminate()
+                        engine.cancel()
                         ai_thinking = False
                     move_undone = True
                 if e.key == pygame.K_r:
-                    gs = GameState()
+                    gs = createGameState()
                     valid_moves = gs.getValidMoves()
+                    draw_reason = None
                     sqSelected = ()
                     playerClicks = []
                     moveMade = False
                     animate = False
                     gameOver = False
                     if ai_thinking:
-                        move_finder_process.terminate()
+                        engine.cancel()
                         ai_thinking = False
                     move_undone = True
                 if e.key == pygame.K_m:
+                    if engine is not None:
+                        engine.close()
                     main_menu()
 
 
@@ -241,13 +250,24 @@ def main(player1=True, player2=False):
         if not gameOver and not human_turn and not move_undone:
             if not ai_thinking:
                 ai_thinking = True
-                return_queue = Queue()  # used to pass data between threads
-                move_finder_process = Process(target=findBestMove, args=(gs, valid_moves, return_queue))
-                move_finder_process.start()
-
-            if not move_finder_process.is_alive():
-                ai_move = return_queue.get()
-                gs.makeMove(ai_move)
+                engine.startSearch(gs, move_time=AI_MOVE_TIME)
+
+            try:
+                ai_notation = engine.pollBestMove()
+            except EngineError as error:  # start a new search process, it searches again from a full position
+                print(error)
+                engine.close()
+                engine = EngineWorker()
+                ai_thinking = False
+                ai_notation = None
+                engine_failures += 1
+                gameOver = engine_failures >= MAX_ENGINE_FAILURES
+            if ai_notation is not None:
+                engine_failures = 0
+                for ai_move in valid_moves:
+                    if ai_move.getChessNotation() == ai_notation:
+                        gs.makeMove(ai_move)
+                        break
                 moveMade = True
                 animate = True
                 ai_thinking = False
@@ -255,6 +275,7 @@ def main(player1=True, player2=False):
             if animate:
                 animateMove(gs.move_log[-1], screen, gs.board, clock)
             valid_moves = gs.getValidMoves()
+            draw_reason = gs.drawReason()
             moveMade = False
             animate = False
             move_undone = False
@@ -263,6 +284,9 @@ def main(player1=True, player2=False):
         if gs.checkMate or gs.staleMate:
             gameOver = True
             draw_endgame_text(screen, 'StaleMate' if gs.staleMate else 'Black wins' if gs.WhiteToMove else 'White wins')
+        elif draw_reason is not None:
+            gameOver = True
+            draw_endgame_text(screen, 'Draw by ' + draw_reason)
 
         pygame.display.flip()
 
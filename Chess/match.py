@@ -0,0 +1,309 @@
+'''
+Self-play match between two configurations of AI.findBestMove, to tell whether a change makes the engine stronger.
+A configuration is a set of AI module settings, e.g. USE_LMR=False. Every opening is played twice with colours
+swapped, games run in a process pool, and the match stops early once a sequential probability ratio test (SPRT)
+accepts either elo0 (the change is not better) or elo1 (it is better by at least that much).
+
+    python match.py --first USE_LMR=True --second USE_LMR=False --nodes 5000
+    python match.py --first NULL_MOVE_REDUCTION=3 --movetime 0.1 --games 2000 --workers 8 --elo0 0 --elo1 10
+
+Each engine keeps its own transposition table, killers and history. The opening book is off, openings come from
+book_lines.txt (cut after --opening-plies) or from a file of FENs given with --openings.
+'''
+import argparse
+import ast
+import math
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+import AI
+from ChessEngine import BACKENDS, DEFAULT_BACKEND, createGameState
+from OpeningBook import playLine
+from TranspositionTable import TranspositionTable
+
+BOOK_LINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'book_lines.txt')
+DEFAULT_OPENING_PLIES = 8
+DEFAULT_GAMES = 1000
+MAX_PLIES = 300  # games still running after this many plies are scored as draws
+MATCH_TT_SIZE_MB = 4  # per engine and worker, two engines live in every worker
+REPORT_INTERVAL = 20  # games between progress lines
+# (lowest, highest) value of the settings a bad value would break: a negative reduction deepens the search instead of
+# reducing it, and the killer tables are sized by the MAX_DEPTH the module was loaded with
+SETTING_RANGES = {'NULL_MOVE_REDUCTION': (0, None), 'LMR_REDUCTION': (0, None), 'NULL_MOVE_MIN_DEPTH': (1, None),
+                  'LMR_MIN_DEPTH': (1, None), 'LMR_FULL_DEPTH_MOVES': (1, None), 'DEPTH': (1, AI.MAX_DEPTH),
+                  'MAX_DEPTH': (1, AI.MAX_DEPTH)}
+
+engines = None  # EngineState of both configurations, set in every pool process by initWorker
+match_settings = None
+
+
+class EngineState:
+    """
+    Settings and search memory of one engine. activate() installs them in the AI module, which keeps its settings and
+    tables in module globals.
+    """
+
+    def __init__(self, config, defaults):
+        self.settings = dict(defaults)
+        self.settings.update(config)
+        self.transposition_table = TranspositionTable(MATCH_TT_SIZE_MB)
+        self.history_table = {}
+        self.killer_moves = [[AI.NO_MOVE] * AI.KILLERS_PER_PLY for _ in range(AI.MAX_DEPTH + 1)]
+
+    def activate(self):
+        for name, value in self.settings.items():
+            setattr(AI, name, value)
+        AI.transposition_table = self.transposition_table
+        AI.history_table = self.history_table
+        AI.killer_moves = self.killer_moves
+
+    def newGame(self):
+        self.activate()
+        AI.newGame()
+
+
+def parseConfig(items):
+    """
+    {name: value} from NAME=VALUE strings, the value a Python literal. Only existing AI settings can be changed, to a
+    value of the same type and inside SETTING_RANGES.
+    """
+    config = {}
+    for item in items:
+        name, separator, text = item.partition('=')
+        if not separator or not name.isupper() or not hasattr(AI, name):
+            raise ValueError('not an AI setting: %s' % item)
+        try:
+            value = ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            raise ValueError('not a Python literal: %s' % item)
+        default = getattr(AI, name)
+        if type(value) is not type(default) and not (type(default) is float and type(value) is int):
+            raise ValueError('%s must be a %s: %s' % (name, type(default).__name__, item))
+        low, high = SETTING_RANGES.get(name, (None, None))
+        if low is not None and value < low:
+            raise ValueError('%s must be at least %d: %s' % (name, low, item))
+        if high is not None and value > high:
+            raise ValueError('%s must be at most %d: %s' % (name, high, item))
+        config[name] = value
+    return config
+
+
+def loadOpenings(path=None, plies=DEFAULT_OPENING_PLIES):
+    """
+    FENs to start games from: the lines of a FEN file, or every distinct book line cut after plies moves.
+    """
+    if path is not None:
+        with open(path) as fen_file:
+            return [line.strip() for line in fen_file if line.strip() and not line.startswith('#')]
+    openings = []
+    with open(BOOK_LINES) as lines_file:
+        for line in lines_file:
+            if not line.strip() or line.startswith('#'):
+                continue
+            game_state = createGameState()
+            for _ in playLine(game_state, line.split()[:plies]):
+                pass
+            fen = game_state.getFen()
+            if fen not in openings:
+                openings.append(fen)
+    return openings
+
+
+def initWorker(configs, settings):
+    global engines, match_settings
+    names = set(configs[0]) | set(configs[1])
+    defaults = {name: getattr(AI, name) for name in names}
+    defaults['USE_BOOK'] = False
+    engines = [EngineState(config, defaults) for config in configs]
+    match_settings = settings
+
+
+def searchLimits(settings):
+    if settings['nodes'] is not None:
+        return {'max_depth': AI.MAX_DEPTH, 'max_nodes': settings['nodes']}
+    if settings['movetime'] is not None:
+        return {'move_time': settings['movetime']}
+    return {'max_depth': settings['depth']}
+
+
+def playGame(task):
+    """
+    Play one game, engine first_white (0 or 1) has the white pieces. Returns (game number, score of the first
+    configuration, how the game ended).
+    """
+    number, fen, first_white, seed = task
+    random.seed(seed)
+    game_state = createGameState(match_settings['backend'], fen=fen)
+    for engine in engines:
+        engine.newGame()
+    limits = searchLimits(match_settings)
+    white_engine = 0 if first_white else 1
+    while True:
+        valid_moves = game_state.getValidMoves()
+        if not valid_moves:
+            if game_state.staleMate:
+                return number, 0.5, 'stalemate'
+            first_won = game_state.WhiteToMove != first_white  # the side to move is mated
+            return number, 1.0 if first_won else 0.0, 'checkmate'
+        reason = game_state.drawReason()
+        if reason is not None:
+            return number, 0.5, reason
+        if len(game_state.move_log) >= MAX_PLIES:
+            return number, 0.5, 'adjudicated'
+        engine = engines[white_engine if game_state.WhiteToMove else 1 - white_engine]
+        engine.activate()
+        best_move, _ = AI.findBestMove(game_state, valid_moves, **limits)
+        game_state.makeMove(best_move)
+
+
+def scoreToElo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def eloToScore(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+class MatchResult:
+    """
+    Wins, draws and losses of the first configuration, with the Elo estimate and the SPRT log likelihood ratio.
+    """
+
+    def __init__(self, elo0=0.0, elo1=5.0, alpha=0.05, beta=0.05):
+        self.wins = self.draws = self.losses = 0
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower_bound = math.log(beta / (1 - alpha))  # accept elo0 at or below this
+        self.upper_bound = math.log((1 - beta) / alpha)  # accept elo1 at or above this
+
+    def add(self, score):
+        if score == 1.0:
+            self.wins += 1
+        elif score == 0.0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    @property
+    def score(self):
+        return (self.wins + 0.5 * self.draws) / self.games if self.games else 0.5
+
+    def variance(self):
+        """
+        Variance of the result of one game.
+        """
+        score = self.score
+        return (self.wins * (1 - score) ** 2 + self.draws * (0.5 - score) ** 2 + self.losses * score ** 2) / self.games
+
+    def elo(self):
+        """
+        Elo estimate and the half width of its 95% confidence interval.
+        """
+        if not self.games:
+            return 0.0, 0.0
+        margin = 1.96 * math.sqrt(self.variance() / self.games)
+        elo = scoreToElo(self.score)
+        return elo, (scoreToElo(self.score + margin) - scoreToElo(self.score - margin)) / 2
+
+    def llr(self):
+        """
+        Log likelihood ratio of elo1 against elo0, using a normal approximation of the game results.
+        """
+        variance = self.variance() if self.games else 0.0
+        if variance == 0.0:
+            return 0.0
+        score0, score1 = eloToScore(self.elo0), eloToScore(self.elo1)
+        return self.games * (score1 - score0) * (2 * self.score - score0 - score1) / (2 * variance)
+
+    def decision(self):
+        llr = self.llr()
+        if llr >= self.upper_bound:
+            return 'H1'
+        if llr <= self.lower_bound:
+            return 'H0'
+        return None
+
+    def __str__(self):
+        elo, margin = self.elo()
+        return 'games %d +%d =%d -%d score %.3f elo %+.1f +/- %.1f llr %.2f (%.2f, %.2f)' % (
+            self.games, self.wins, self.draws, self.losses, self.score, elo, margin, self.llr(), self.lower_bound,
+            self.upper_bound)
+
+
+def runMatch(first, second, openings, games=DEFAULT_GAMES, workers=None, settings=None, elo0=0.0, elo1=5.0,
+             alpha=0.05, beta=0.05, seed=1, out=sys.stdout):
+    """
+    Play up to games games, stopping when the SPRT reaches a decision. Returns the MatchResult.
+    """
+    settings = settings or {'nodes': 5000, 'movetime': None, 'depth': None, 'backend': DEFAULT_BACKEND}
+    workers = workers or os.cpu_count() or 1
+    result = MatchResult(elo0, elo1, alpha, beta)
+    tasks = [(number, openings[number // 2 % len(openings)], number % 2 == 0, seed + number)
+             for number in range(games)]
+    start = time.perf_counter()
+    pool = Pool(workers, initializer=initWorker, initargs=((first, second), settings))
+    try:
+        for _, score, _ in pool.imap_unordered(playGame, tasks):
+            result.add(score)
+            decision = result.decision()
+            if result.games % REPORT_INTERVAL == 0 or decision is not None:
+                elapsed = time.perf_counter() - start
+                print('%s games/s %.2f' % (result, result.games / elapsed), file=out)
+                out.flush()
+            if decision is not None:
+                break
+    finally:
+        pool.terminate()
+        pool.join()
+    elapsed = time.perf_counter() - start
+    decision = result.decision()
+    print('%s games/s %.2f' % (result, result.games / elapsed if elapsed else 0), file=out)
+    print('SPRT: %s' % {'H1': 'first is stronger (elo1 accepted)', 'H0': 'first is not stronger (elo0 accepted)',
+                        None: 'no decision'}[decision], file=out)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Self-play match between two AI configurations with SPRT.')
+    parser.add_argument('--first', nargs='*', default=[], metavar='NAME=VALUE', help='AI settings of the first engine')
+    parser.add_argument('--second', nargs='*', default=[], metavar='NAME=VALUE',
+                        help='AI settings of the second engine')
+    limit = parser.add_mutually_exclusive_group()
+    limit.add_argument('--nodes', type=int, help='nodes per move, quiescence nodes included (default 5000)')
+    limit.add_argument('--movetime', type=float, help='seconds per move')
+    limit.add_argument('--depth', type=int, help='fixed depth per move')
+    parser.add_argument('--games', type=int, default=DEFAULT_GAMES, help='most games to play')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--openings', help='file with one FEN per line instead of the book lines')
+    parser.add_argument('--opening-plies', type=int, default=DEFAULT_OPENING_PLIES)
+    parser.add_argument('--elo0', type=float, default=0.0)
+    parser.add_argument('--elo1', type=float, default=5.0)
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=DEFAULT_BACKEND)
+    args = parser.parse_args(argv)
+    try:
+        first, second = parseConfig(args.first), parseConfig(args.second)
+    except ValueError as error:
+        parser.error(str(error))
+    if args.nodes is None and args.movetime is None and args.depth is None:
+        args.nodes = 5000
+    settings = {'nodes': args.nodes, 'movetime': args.movetime, 'depth': args.depth, 'backend': args.backend}
+    openings = loadOpenings(args.openings, args.opening_plies)
+    print('%d openings, %s vs %s' % (len(openings), first or 'defaults', second or 'defaults'))
+    runMatch(first, second, openings, args.games, args.workers, settings, args.elo0, args.elo1, args.alpha, args.beta,
+             args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+'''
+Perft: count the leaf nodes of the legal move tree of a position to a fixed depth.
+Counts are compared with published reference values, so this is both the regression test for getValidMoves and the
+benchmark for every move generation change.
+
+    python perft.py                         # reference positions on the default backend
+    python perft.py --backend numpy --depth 3
+    python perft.py --divide --depth 3      # nodes below each root move of the start position
+
+The engine only promotes to a queen, so reference depths stop before the first under-promotion.
+'''
+import argparse
+import sys
+import time
+
+_import_start = time.perf_counter()
+from ChessEngine import BACKENDS, DEFAULT_BACKEND, STARTING_FEN, createGameState
+
+ENGINE_IMPORT_TIME = time.perf_counter() - _import_start  # includes building the move generation tables
+
+DEFAULT_MAX_DEPTH = 4
+
+# name -> (FEN, leaf counts for depth 1, 2, 3, ...)
+REFERENCE_POSITIONS = {
+    'startpos': (STARTING_FEN, (20, 400, 8902, 197281, 4865609)),
+    'kiwipete': ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', (48, 2039, 97862)),
+    'endgame': ('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', (14, 191, 2812, 43238, 674624)),
+    'position4': ('r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1', (6,)),
+    'position6': ('r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10', (46, 2079, 89890)),
+}
+
+
+def newPosition(name, backend=DEFAULT_BACKEND):
+    return createGameState(backend, fen=REFERENCE_POSITIONS[name][0])
+
+
+def perft(game_state, depth):
+    moves = game_state.getValidMoves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        game_state.makeMove(move)
+        nodes += perft(game_state, depth - 1)
+        game_state.undoMove()
+    return nodes
+
+
+def divide(game_state, depth):
+    """
+    Leaf count below every root move, the usual way to find which move a generator gets wrong.
+    """
+    counts = {}
+    for move in game_state.getValidMoves():
+        game_state.makeMove(move)
+        counts[move.getChessNotation()] = perft(game_state, depth - 1) if depth > 1 else 1
+        game_state.undoMove()
+    return counts
+
+
+def runSuite(backend=DEFAULT_BACKEND, max_depth=DEFAULT_MAX_DEPTH, positions=None, out=sys.stdout):
+    """
+    Run perft on the reference positions up to max_depth, print nodes and nodes/second per depth and return a list
+    of (position, depth, expected, found) mismatches.
+    """
+    failures = []
+    total_nodes = 0
+    total_time = 0.0
+    for name in positions or REFERENCE_POSITIONS:
+        expected_counts = REFERENCE_POSITIONS[name][1]
+        game_state = newPosition(name, backend)
+        for depth in range(1, min(max_depth, len(expected_counts)) + 1):
+            start = time.perf_counter()
+            nodes = perft(game_state, depth)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+            expected = expected_counts[depth - 1]
+            status = 'ok' if nodes == expected else 'MISMATCH expected %d' % expected
+            print('%-10s depth %d nodes %10d time %8.3fs nps %9d  %s' %
+                  (name, depth, nodes, elapsed, nodes / elapsed if elapsed else 0, status), file=out)
+            if nodes != expected:
+                failures.append((name, depth, expected, nodes))
+    print('%s total nodes %d time %.3fs nps %d' %
+          (backend, total_nodes, total_time, total_nodes / total_time if total_time else 0), file=out)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Move generator node counts and speed.')
+    parser.add_argument('--backend', choices=sorted(BACKENDS) + ['all'], default=DEFAULT_BACKEND)
+    parser.add_argument('--depth', type=int, default=DEFAULT_MAX_DEPTH, help='deepest depth to count')
+    parser.add_argument('--position', choices=sorted(REFERENCE_POSITIONS), action='append',
+                        help='only this position, may be repeated')
+    parser.add_argument('--divide', action='store_true', help='print the count below every root move')
+    args = parser.parse_args(argv)
+
+    backends = sorted(BACKENDS) if args.backend == 'all' else [args.backend]
+    print('engine import time %.3fs' % ENGINE_IMPORT_TIME)
+    if args.divide:
+        for backend in backends:
+            for name in args.position or REFERENCE_POSITIONS:
+                counts = divide(newPosition(name, backend), args.depth)
+                for move in sorted(counts):
+                    print('%s: %d' % (move, counts[move]))
+                print('%s %s depth %d nodes %d' % (backend, name, args.depth, sum(counts.values())))
+        return 0
+
+    failures = []
+    for backend in backends:
+        failures += [(backend,) + failure for failure in runSuite(backend, args.depth, args.position)]
+    for backend, name, depth, expected, found in failures:
+        print('FAILED %s %s depth %d: expected %d nodes, got %d' % (backend, name, depth, expected, found),
+              file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+'''
+Headless UCI front end, so the engine can be run by tournament managers and scripts without a display.
+
+    python uci.py
+
+Supported commands: uci, isready, ucinewgame, setoption (Hash, Threads, OwnBook, BookFile),
+position [startpos | fen <fen>] [moves ...], go [depth N] [movetime MS] [wtime MS] [btime MS] [winc MS] [binc MS]
+[infinite], stop, quit, and bench [depth] which runs bench.py.
+The search runs in a thread so stop is read while it thinks, and reports every completed depth as an info line.
+The engine only promotes to a queen, so a promotion move is played as a queen whatever piece it names.
+'''
+import sys
+import threading
+import time
+
+import AI
+from ChessEngine import DEFAULT_BACKEND, STARTING_FEN, createGameState
+from ParallelSearch import ParallelSearch
+from TranspositionTable import TranspositionTable
+from bench import DEFAULT_BENCH_DEPTH, bench
+
+ENGINE_NAME = 'Chess'
+ENGINE_AUTHOR = 'Chess developers'
+MAX_THREADS = 64
+MAX_HASH_MB = 1024
+
+
+def uciMove(move):
+    return move.getChessNotation() + ('q' if move.isPawnPromotion else '')
+
+
+def uciScore(score):
+    """
+    'cp N', or 'mate N' for a mate score: mate in N moves, negative when the side to move is the one mated.
+    """
+    if score >= AI.MATE_BOUND:
+        return 'mate %d' % ((AI.CHECKMATE - score + 1) // 2)
+    if score <= -AI.MATE_BOUND:
+        return 'mate %d' % -((AI.CHECKMATE + score) // 2)
+    return 'cp %d' % round(score)
+
+
+def findMove(game_state, text):
+    for move in game_state.getValidMoves():
+        if move.getChessNotation() == text[:4]:
+            return move
+    raise ValueError('illegal move %s' % text)
+
+
+class UciEngine:
+    def __init__(self, out=sys.stdout, backend=DEFAULT_BACKEND):
+        self.out = out
+        self.backend = backend
+        self.game_state = createGameState(backend)
+        self.searcher = ParallelSearch(1)
+        self.search_thread = None
+        self.stop_requested = False
+        self.infinite_done = threading.Event()  # set by stop, an infinite search may not answer before it
+
+    def send(self, line):
+        self.out.write(line + '\n')
+        self.out.flush()
+
+    '''
+    Handle one input line, return False once the engine should exit
+    '''
+
+    def handle(self, line):
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, arguments = tokens[0], tokens[1:]
+        if command == 'uci':
+            self.send('id name %s' % ENGINE_NAME)
+            self.send('id author %s' % ENGINE_AUTHOR)
+            self.send('option name Hash type spin default %d min 1 max %d' % (AI.TT_SIZE_MB, MAX_HASH_MB))
+            self.send('option name Threads type spin default 1 min 1 max %d' % MAX_THREADS)
+            self.send('option name OwnBook type check default %s' % ('true' if AI.USE_BOOK else 'false'))
+            self.send('option name BookFile type string default %s' % AI.BOOK_PATH)
+            self.send('uciok')
+        elif command == 'isready':
+            self.send('readyok')
+        elif command == 'ucinewgame':
+            self.waitForSearch()
+            self.searcher.newGame()
+        elif command == 'setoption':
+            self.waitForSearch()
+            self.setOption(arguments)
+        elif command == 'position':
+            self.waitForSearch()
+            self.setPosition(arguments)
+        elif command == 'go':
+            self.waitForSearch()
+            self.go(arguments)
+        elif command == 'bench':
+            self.waitForSearch()
+            bench(int(arguments[0]) if arguments else DEFAULT_BENCH_DEPTH, self.backend, out=self.out)
+        elif command == 'stop':
+            self.stopSearch()
+        elif command == 'quit':
+            self.stopSearch()
+            self.waitForSearch()
+            self.searcher.close()
+            return False
+        return True
+
+    def setOption(self, arguments):
+        if 'name' not in arguments or 'value' not in arguments:
+            return
+        name = ' '.join(arguments[arguments.index('name') + 1:arguments.index('value')]).lower()
+        value = arguments[arguments.index('value') + 1]
+        if name == 'hash':
+            AI.transposition_table = TranspositionTable(max(1, min(int(value), MAX_HASH_MB)))
+        elif name == 'threads':
+            self.searcher.close()
+            self.searcher = ParallelSearch(max(1, min(int(value), MAX_THREADS)))
+        elif name == 'ownbook':
+            AI.USE_BOOK = value.lower() == 'true'
+        elif name == 'bookfile':
+            path = ' '.join(arguments[arguments.index('value') + 1:])
+            try:
+                AI.openBook(path)
+            except OSError as error:
+                self.send('info string %s' % error)
+
+    def setPosition(self, arguments):
+        if 'moves' in arguments:
+            moves = arguments[arguments.index('moves') + 1:]
+            arguments = arguments[:arguments.index('moves')]
+        else:
+            moves = []
+        if arguments and arguments[0] == 'fen':
+            fen = ' '.join(arguments[1:])
+        else:
+            fen = STARTING_FEN
+        try:
+            game_state = createGameState(self.backend, fen=fen)
+            for text in moves:
+                game_state.makeMove(findMove(game_state, text))
+        except ValueError as error:
+            self.send('info string %s' % error)
+            return
+        self.game_state = game_state
+
+    def go(self, arguments):
+        limits = {}
+        infinite = 'infinite' in arguments
+        values = {arguments[i]: arguments[i + 1] for i in range(len(arguments) - 1)}
+        if 'depth' in values:
+            limits['max_depth'] = int(values['depth'])
+        elif 'movetime' in values:
+            limits['move_time'] = int(values['movetime']) / 1000
+        elif infinite:
+            limits['max_depth'] = AI.MAX_DEPTH
+        else:
+            clock, increment = ('wtime', 'winc') if self.game_state.WhiteToMove else ('btime', 'binc')
+            if clock in values:
+                limits['time_left'] = int(values[clock]) / 1000
+                limits['increment'] = int(values.get(increment, 0)) / 1000
+        self.stop_requested = False
+        self.infinite_done.clear()
+        self.search_thread = threading.Thread(target=self.search, args=(limits, infinite), daemon=True)
+        self.search_thread.start()
+
+    def search(self, limits, infinite):
+        game_state = self.game_state
+        valid_moves = game_state.getValidMoves()
+        if not valid_moves:
+            self.send('bestmove 0000')
+            return
+        start_time = time.perf_counter()
+
+        def reportDepth(depth, score, best_move):
+            elapsed = time.perf_counter() - start_time
+            nodes = AI.count if self.searcher.pool is None else self.searcher.nodes
+            line = AI.principalVariation(game_state, best_move, depth) if self.searcher.pool is None else [best_move]
+            self.send('info depth %d score %s nodes %d nps %d time %d pv %s' %
+                      (depth, uciScore(score), nodes, nodes / elapsed if elapsed else 0, elapsed * 1000,
+                       ' '.join(uciMove(move) for move in line)))
+
+        best_move, _ = self.searcher.findBestMove(game_state, valid_moves, should_stop=lambda: self.stop_requested,
+                                                  depth_callback=reportDepth, **limits)
+        if infinite:
+            self.infinite_done.wait()
+        self.send('bestmove %s' % uciMove(best_move))
+
+    def stopSearch(self):
+        self.stop_requested = True
+        self.infinite_done.set()
+
+    def waitForSearch(self):
+        if self.search_thread is not None:
+            self.search_thread.join()
+            self.search_thread = None
+
+
+def main(input_stream=sys.stdin):
+    engine = UciEngine(sys.stdout)
+    for line in input_stream:
+        if not engine.handle(line):
+            break
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())